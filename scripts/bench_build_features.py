@@ -0,0 +1,59 @@
+#!/usr/bin/env python
+# Time build_features_v1 on a synthetic universe: the monolithic in-memory build vs the
+# --by-ticker streaming build with one ticker per build_features call (batch=1, the old
+# per-partition path), with batches of tickers, and with batches spread over --jobs workers.
+import argparse, sys, statistics, tempfile, time
+from pathlib import Path
+import numpy as np, pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))  # repo root, for src.projectname
+from scripts.build_features_v1 import build_by_ticker, build_features, select_keep
+from src.projectname.partitions import write_partition
+
+def universe(tickers, days, seed=0):
+    rng = np.random.default_rng(seed)
+    dates = pd.bdate_range("2015-01-01", periods=days)
+    lr = rng.normal(0, 0.02, (tickers, days)).astype("float32")
+    return pd.DataFrame({"ticker": np.repeat([f"T{i:04d}" for i in range(tickers)], days), "date": np.tile(dates, tickers),
+                         "log_return": lr.ravel(), "adj_close": (100 * np.exp(lr.cumsum(axis=1))).ravel().astype("float32"),
+                         "volume": 1000})
+
+def timeit(fn, repeat):
+    ts = []
+    for _ in range(repeat):
+        t0 = time.perf_counter(); fn(); ts.append(time.perf_counter() - t0)
+    return statistics.median(ts)
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--tickers", type=int, default=500)
+    ap.add_argument("--days", type=int, default=1500)
+    ap.add_argument("--batches", type=int, nargs="+", default=[1, 16, 64])
+    ap.add_argument("--jobs", type=int, nargs="+", default=[2, 4], help="worker counts, at the largest batch")
+    ap.add_argument("--repeat", type=int, default=1)
+    ap.add_argument("--out", default="reports/build_features_bench.csv")
+    args, _ = ap.parse_known_args()
+
+    df = universe(args.tickers, args.days)
+    rows = [{"impl": "monolithic", "batch": args.tickers, "jobs": 1,
+             "secs": timeit(lambda: select_keep(build_features(df)), args.repeat)}]
+    with tempfile.TemporaryDirectory(prefix="bench-fv1-") as tmp:
+        for t, g in df.groupby("ticker", sort=True):
+            write_partition(g[["date","log_return"]], f"{tmp}/returns_by_ticker", t)
+            write_partition(g[["date","adj_close","volume"]], f"{tmp}/prices_by_ticker", t)
+        for b in args.batches:
+            rows.append({"impl": "by_ticker", "batch": b, "jobs": 1,
+                         "secs": timeit(lambda: build_by_ticker(tmp, f"{tmp}/out", batch=b), args.repeat)})
+        b = max(args.batches)
+        for j in args.jobs:
+            rows.append({"impl": "by_ticker", "batch": b, "jobs": j,
+                         "secs": timeit(lambda: build_by_ticker(tmp, f"{tmp}/out", batch=b, jobs=j), args.repeat)})
+    res = pd.DataFrame(rows).assign(rows=len(df), secs=lambda d: d["secs"].round(2))
+    print(res.to_string(index=False))
+    if args.out:
+        Path(args.out).parent.mkdir(parents=True, exist_ok=True)
+        res.to_csv(args.out, index=False)
+        print("Wrote", args.out)
+
+if __name__ == "__main__":
+    main()
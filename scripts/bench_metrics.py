@@ -0,0 +1,71 @@
+#!/usr/bin/env python
+# Time per-group metrics: one scalar mae/smape/mase call per (split, model, regime, ticker)
+# group, as the evaluators used to do, vs one grouped per_group() + summarize() pass.
+import argparse, sys, statistics, time
+from pathlib import Path
+import numpy as np, pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))  # repo root, for src.projectname
+from src.projectname.metrics import mae, per_group, smape, summarize
+
+def long_table(splits, tickers, rows, seed=0):
+    # rows = validation rows per (split, ticker); two models, three regimes
+    rng = np.random.default_rng(seed)
+    n = splits * tickers * rows
+    base = pd.DataFrame({"split": np.repeat(np.arange(splits), tickers * rows),
+                         "ticker": np.tile(np.repeat([f"T{i:04d}" for i in range(tickers)], rows), splits),
+                         "regime": rng.choice(["low", "med", "high"], n), "y": rng.normal(0, 0.02, n)})
+    scale = pd.Series(rng.uniform(0.01, 0.03, splits * tickers)).to_numpy()
+    base["scale"] = scale[base["split"].to_numpy() * tickers + np.tile(np.repeat(np.arange(tickers), rows), splits)]
+    return pd.concat([base.assign(model="naive", yhat=rng.normal(0, 0.02, n)),
+                      base.assign(model="lin", yhat=rng.normal(0, 0.02, n))], ignore_index=True)
+
+def loop(df):
+    out = []
+    for (sp, m, reg), g in df.groupby(["split", "model", "regime"], sort=True):
+        pt = []
+        for tkr, gv in g.groupby("ticker"):
+            s = gv["scale"].iloc[0]
+            pt.append({"n": len(gv), "mae": mae(gv["y"], gv["yhat"]), "smape": smape(gv["y"], gv["yhat"]),
+                       "mase": mae(gv["y"], gv["yhat"]) / (s + 1e-12)})
+        pt = pd.DataFrame(pt); w = pt["n"].to_numpy()
+        out.append({"split": sp, "model": m, "regime": reg, **{f"macro_{k}": pt[k].mean() for k in ["mae","smape","mase"]},
+                    **{f"micro_{k}": np.average(pt[k], weights=w) for k in ["mae","smape","mase"]}})
+    return pd.DataFrame(out)
+
+def grouped(df):
+    pt = per_group({c: df[c].to_numpy() for c in ["split", "model", "regime", "ticker"]},
+                   df["y"].to_numpy(), df["yhat"].to_numpy(), scale=df["scale"].to_numpy())
+    return summarize(pt, ["split", "model", "regime"])
+
+def timeit(fn, repeat):
+    ts, res = [], None
+    for _ in range(repeat):
+        t0 = time.perf_counter(); res = fn(); ts.append(time.perf_counter() - t0)
+    return statistics.median(ts), res
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--splits", type=int, default=10)
+    ap.add_argument("--tickers", type=int, default=100)
+    ap.add_argument("--rows", type=int, default=21, help="validation rows per split and ticker")
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument("--out", default="reports/metrics_bench.csv")
+    args, _ = ap.parse_known_args()
+
+    df = long_table(args.splits, args.tickers, args.rows)
+    t_loop, ref = timeit(lambda: loop(df), args.repeat)
+    t_grp, got = timeit(lambda: grouped(df), args.repeat)
+    cols = [c for c in ref.columns if c.startswith(("macro_", "micro_"))]
+    err = float(np.max(np.abs(ref[cols].to_numpy(float) - got[cols].to_numpy(float))))
+    res = pd.DataFrame([{"impl": "loop", "rows": len(df), "groups": len(ref), "median_ms": round(t_loop * 1000, 2)},
+                        {"impl": "grouped", "rows": len(df), "groups": len(got), "median_ms": round(t_grp * 1000, 2)}])
+    print(res.to_string(index=False))
+    print(f"speedup x{t_loop / t_grp:.1f}, max abs diff {err:.2e}")
+    if args.out:
+        Path(args.out).parent.mkdir(parents=True, exist_ok=True)
+        res.to_csv(args.out, index=False)
+        print("Wrote", args.out)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+#!/usr/bin/env python
+# Time the same sql/*.sql files on SQLite vs the Parquet (DuckDB) backend of sqlio.
+import argparse, sys, sqlite3, statistics, tempfile, time
+from pathlib import Path
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))  # repo root, for src.projectname
+from src.projectname.sqlio import PARQUET_ROOT, close_pool, parquet_connection, query_df
+
+QUERIES = [  # (sql file, params)
+    ("sql/features_window.sql", ["2019-01-01", "2025-08-01"]),
+    ("sql/sector_top_moves.sql", []),
+]
+
+def mirror_to_sqlite(parquet_root, db_path):
+    # Copy the Parquet views into a SQLite file with the build_db indexes, so both
+    # backends answer over identical rows.
+    con = parquet_connection(parquet_root)
+    prices = con.execute("SELECT ticker, strftime(date, '%Y-%m-%d') AS date, log_return FROM prices").df()
+    meta = con.execute("SELECT * FROM meta").df()
+    out = sqlite3.connect(db_path)
+    out.executescript("""
+        CREATE TABLE meta (ticker TEXT PRIMARY KEY, name TEXT, sector TEXT);
+        CREATE TABLE prices (ticker TEXT, date TEXT, log_return REAL, PRIMARY KEY (ticker,date));
+        CREATE INDEX idx_prices_date ON prices(date);
+    """)
+    meta.to_sql("meta", out, if_exists="append", index=False)
+    prices.drop_duplicates(["ticker","date"]).to_sql("prices", out, if_exists="append", index=False)
+    out.commit(); out.close()
+
+def timeit(fn, repeat):
+    ts, res = [], None
+    for _ in range(repeat):
+        t0 = time.perf_counter(); res = fn(); ts.append(time.perf_counter() - t0)
+    return statistics.median(ts), res
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--parquet-root", default=str(PARQUET_ROOT))
+    ap.add_argument("--db", default="", help="SQLite file to compare against (default: mirror of the Parquet data)")
+    ap.add_argument("--repeat", type=int, default=5)
+    ap.add_argument("--out", default="reports/sql_backend_bench.csv")
+    args, _ = ap.parse_known_args()
+
+    tmp = tempfile.TemporaryDirectory()
+    db = args.db or str(Path(tmp.name) / "mirror.db")
+    if not args.db:
+        mirror_to_sqlite(args.parquet_root, db)
+
+    rows = []
+    for sqlfile, params in QUERIES:
+        sql = Path(sqlfile).read_text()
+        for backend in ["sqlite", "parquet"]:
+            run = lambda: query_df(sql, params or None, db_path=db, backend=backend,
+                                   parquet_root=args.parquet_root)
+            run()  # warm-up: open pooled connection / file metadata
+            secs, df = timeit(run, args.repeat)
+            rows.append({"sqlfile": sqlfile, "backend": backend, "rows": len(df),
+                         "median_ms": round(secs * 1000, 2)})
+    close_pool(); tmp.cleanup()
+
+    res = pd.DataFrame(rows)
+    print(res.to_string(index=False))
+    if args.out:
+        Path(args.out).parent.mkdir(parents=True, exist_ok=True)
+        res.to_csv(args.out, index=False)
+        print("Wrote", args.out)
+
+if __name__ == "__main__":
+    main()
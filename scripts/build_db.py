@@ -1,9 +1,12 @@
 # scripts/build_db.py
 #!/usr/bin/env python
-import argparse, sys, textwrap, sqlite3
+import argparse, sys, textwrap, sqlite3, time
 from pathlib import Path
 import pandas as pd, numpy as np
 
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))  # repo root, for src.projectname
+from src.projectname.sqlio import SECTOR_DAILY_DDL, refresh_sector_daily
+
 DDL = textwrap.dedent("""
 PRAGMA foreign_keys = ON;
 CREATE TABLE IF NOT EXISTS meta (
@@ -21,7 +24,9 @@ CREATE TABLE IF NOT EXISTS prices (
   FOREIGN KEY (ticker) REFERENCES meta(ticker)
 );
 CREATE INDEX IF NOT EXISTS idx_prices_date ON prices(date);
-""")
+-- expression index: ORDER BY ABS(log_return) DESC LIMIT k walks it instead of sorting prices
+CREATE INDEX IF NOT EXISTS idx_prices_abs_return ON prices(ABS(log_return));
+""") + SECTOR_DAILY_DDL
 
 def load_meta(con, tickers_csv: Path):
     if tickers_csv.exists():
@@ -38,21 +43,101 @@ def load_meta(con, tickers_csv: Path):
         con.executemany("INSERT OR REPLACE INTO meta(ticker,name,sector) VALUES(?,?,?)",
                         meta.itertuples(index=False, name=None))
 
-def load_prices(con, prices_csv: Path):
-    df = pd.read_csv(prices_csv, parse_dates=["date"])
-    df["date"] = df["date"].dt.strftime("%Y-%m-%d")
-    df = df[["ticker","date","adj_close","volume","log_return"]].drop_duplicates(["ticker","date"])
+PRICE_COLS = ["ticker","date","adj_close","volume","log_return"]
+
+def iter_price_chunks(prices_csv: Path, chunk_rows: int = 200_000):
+    # Stream the CSV as normalized chunks (TEXT YYYY-MM-DD dates, fixed column order)
+    for chunk in pd.read_csv(prices_csv, usecols=PRICE_COLS, chunksize=chunk_rows):
+        chunk["date"] = pd.to_datetime(chunk["date"]).dt.strftime("%Y-%m-%d")
+        yield chunk[PRICE_COLS]
+
+def refresh_loaded_days(con, stage_table: str):
+    # Keep sector_daily in step with prices for just the days this load touched
+    lo, hi = con.execute(f"SELECT MIN(date), MAX(date) FROM {stage_table}").fetchone()
+    if lo is not None:
+        refresh_sector_daily(con, lo, hi)
+
+def load_prices(con, prices_csv: Path, chunk_rows: int = 200_000):
+    # Streaming ingest: Python holds one chunk at a time. Dedup on (ticker,date) across chunk
+    # boundaries is done by the staging table's primary key (INSERT OR IGNORE -> first wins,
+    # matching drop_duplicates), so the seen-key set lives in SQLite, not in memory.
+    con.executescript("""
+        DROP TABLE IF EXISTS temp.prices_dedup;
+        CREATE TEMP TABLE prices_dedup (
+          ticker TEXT, date TEXT, adj_close REAL, volume INTEGER, log_return REAL,
+          PRIMARY KEY (ticker,date)
+        );
+    """)
     with con:
-        con.executemany(
-            "INSERT OR REPLACE INTO prices(ticker,date,adj_close,volume,log_return) VALUES(?,?,?,?,?)",
-            df.itertuples(index=False, name=None)
-        )
+        for chunk in iter_price_chunks(prices_csv, chunk_rows):
+            chunk = chunk.drop_duplicates(["ticker","date"])
+            con.executemany("INSERT OR IGNORE INTO prices_dedup VALUES(?,?,?,?,?)",
+                            chunk.itertuples(index=False, name=None))
+        con.execute("""
+            INSERT OR REPLACE INTO prices(ticker,date,adj_close,volume,log_return)
+            SELECT ticker, date, adj_close, volume, log_return FROM prices_dedup
+        """)
+        refresh_loaded_days(con, "temp.prices_dedup")
+    con.execute("DROP TABLE temp.prices_dedup;")
+
+def bulk_load_prices(con, prices_csv: Path, chunk_rows: int = 200_000):
+    # Fast path for large loads: append into an unconstrained on-disk staging table (so only
+    # one chunk is ever in memory), merge into prices with one set-based statement, and build
+    # the secondary indexes once at the end. The journal mode and synchronous level are
+    # restored afterwards; the DB is left as the default path leaves it.
+    t0 = time.perf_counter()
+    journal = con.execute("PRAGMA journal_mode;").fetchone()[0]
+    sync = con.execute("PRAGMA synchronous;").fetchone()[0]
+    con.execute("PRAGMA journal_mode = WAL;")
+    con.execute("PRAGMA synchronous = OFF;")
+    con.execute("PRAGMA cache_size = -200000;")  # ~200 MB page cache
+    con.executescript("""
+        DROP INDEX IF EXISTS idx_prices_date;
+        DROP INDEX IF EXISTS idx_prices_abs_return;
+        DROP TABLE IF EXISTS main.prices_stage;
+        CREATE TABLE main.prices_stage (
+          ticker TEXT, date TEXT, adj_close REAL, volume INTEGER, log_return REAL
+        );
+    """)
+    n = 0
+    with con:
+        for chunk in iter_price_chunks(prices_csv, chunk_rows):
+            con.executemany("INSERT INTO prices_stage VALUES(?,?,?,?,?)",
+                            chunk.itertuples(index=False, name=None))
+            n += len(chunk)
+    t_stage = time.perf_counter()
+    with con:
+        # first occurrence of each (ticker,date) wins, as with drop_duplicates(); key order
+        # keeps primary-key inserts sequential
+        con.execute("""
+            INSERT OR REPLACE INTO prices(ticker,date,adj_close,volume,log_return)
+            SELECT ticker, date, adj_close, volume, log_return
+            FROM prices_stage
+            WHERE rowid IN (SELECT MIN(rowid) FROM prices_stage GROUP BY ticker, date)
+            ORDER BY ticker, date
+        """)
+        refresh_loaded_days(con, "main.prices_stage")
+    t_merge = time.perf_counter()
+    con.execute("CREATE INDEX IF NOT EXISTS idx_prices_date ON prices(date);")
+    con.execute("CREATE INDEX IF NOT EXISTS idx_prices_abs_return ON prices(ABS(log_return));")
+    con.execute("DROP TABLE main.prices_stage;")
+    con.execute(f"PRAGMA synchronous = {int(sync)};")
+    con.execute(f"PRAGMA journal_mode = {journal};")
+    t1 = time.perf_counter()
+    secs = t1 - t0
+    print(f"Bulk-loaded {n:,} rows in {secs:.2f}s ({n/max(secs,1e-9):,.0f} rows/s; "
+          f"stage {t_stage-t0:.2f}s, merge {t_merge-t_stage:.2f}s, index {t1-t_merge:.2f}s)")
+    return n
 
 def main():
     ap = argparse.ArgumentParser()
     ap.add_argument("--db", default="data/prices.db")
     ap.add_argument("--tickers", default="tickers_25.csv")
     ap.add_argument("--prices", default="data/raw/prices.csv")
+    ap.add_argument("--chunk-rows", type=int, default=200_000,
+                    help="CSV rows per chunk; bounds peak memory during ingest")
+    ap.add_argument("--bulk", action="store_true",
+                    help="staged bulk load (WAL + synchronous=OFF during the load, deferred index build)")
     # args = ap.parse_args()
     args, _ = ap.parse_known_args()
 
@@ -60,7 +145,10 @@ def main():
     con = sqlite3.connect(args.db)
     con.executescript(DDL)
     load_meta(con, Path(args.tickers))
-    load_prices(con, Path(args.prices))
+    if args.bulk:
+        bulk_load_prices(con, Path(args.prices), args.chunk_rows)
+    else:
+        load_prices(con, Path(args.prices), args.chunk_rows)
     con.close()
     print("Built DB:", args.db)
 
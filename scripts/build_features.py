@@ -1,28 +1,51 @@
 #!/usr/bin/env python
-import argparse
+import argparse, sys
 from pathlib import Path
 import pandas as pd, numpy as np
 
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))  # repo root, for src.projectname
+from src.projectname.partitions import list_tickers, read_partition, write_partition
+from src.projectname.rolling import rolling_stats, segments
+
+def make_features(df, roll=20):
+    df = df.sort_values(["ticker","date"])
+    # groupwise lags
+    df["r_1d"] = df["log_return"]
+    for k in (1,2,3):
+        df[f"lag{k}"] = df.groupby("ticker")["r_1d"].shift(k)
+    # rows are ticker-sorted, so the prefix-sum kernel can run on the whole column at once
+    seg_start, _ = segments(df["ticker"].to_numpy())
+    st = rolling_stats(df["r_1d"].to_numpy(), seg_start, [roll], min_periods=roll//2, dtype=np.float64)
+    df["roll_mean"] = st[f"roll_mean_{roll}"]
+    df["roll_std"]  = st[f"roll_std_{roll}"]
+    return df
+
 def main():
     ap = argparse.ArgumentParser()
     ap.add_argument("--input", default="data/raw/prices.csv")
     ap.add_argument("--out", default="data/processed/features.parquet")
     ap.add_argument("--roll", type=int, default=20)
+    ap.add_argument("--by-ticker", action="store_true",
+                    help="stream ticker partitions from --src; --out is then a ticker=... directory")
+    ap.add_argument("--src", default="data/processed", help="root holding returns_by_ticker/prices_by_ticker")
     args = ap.parse_args()
 
-    df = pd.read_csv(args.input, parse_dates=["date"])
-    df = df.sort_values(["ticker","date"])
-    # groupwise lags
-    df["r_1d"] = df["log_return"]
-    for k in (1,2,3):
-        df[f"lag{k}"] = df.groupby("ticker")["r_1d"].shift(k)
-    df["roll_mean"] = (df.groupby("ticker")["r_1d"]
-                         .rolling(args.roll, min_periods=args.roll//2).mean()
-                         .reset_index(level=0, drop=True))
-    df["roll_std"]  = (df.groupby("ticker")["r_1d"]
-                         .rolling(args.roll, min_periods=args.roll//2).std()
-                         .reset_index(level=0, drop=True))
     out = Path(args.out)
+    if args.by_ticker:
+        # one ticker in memory at a time; same columns as the prices.csv path
+        if out.suffix == ".parquet":
+            out = out.with_name(out.stem + "_by_ticker")
+        rows, tickers = 0, list_tickers(f"{args.src}/returns_by_ticker")
+        for t in tickers:
+            ret = read_partition(f"{args.src}/returns_by_ticker", t, ["date","log_return"])
+            px = read_partition(f"{args.src}/prices_by_ticker", t, ["date","adj_close","volume"])
+            df = make_features(px.merge(ret, on=["ticker","date"], how="left"), args.roll)
+            write_partition(df, out, t, compression="snappy")
+            rows += len(df)
+        print("Wrote", out, "tickers:", len(tickers), "rows:", rows)
+        return
+
+    df = make_features(pd.read_csv(args.input, parse_dates=["date"]), args.roll)
     out.parent.mkdir(parents=True, exist_ok=True)
     # Save compactly
     df.to_parquet(out, index=False)
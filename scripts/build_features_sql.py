@@ -1,7 +1,96 @@
 #!/usr/bin/env python
-import argparse, sqlite3, pandas as pd, math
+import argparse, sys, sqlite3, math
+import numpy as np, pyarrow as pa, pyarrow.compute as pc, pyarrow.parquet as pq
 from pathlib import Path
 
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))  # repo root, for src.projectname
+from src.projectname.sqlio import BACKENDS, PARQUET_ROOT, parquet_connection
+
+# The window SQL is streamed: the cursor is fetched batch_rows at a time into typed Arrow
+# record batches, derived columns and the drop-head trim are computed per batch, and each
+# batch goes straight to a ParquetWriter, so the full result is never held in memory.
+# This relies on the SQL returning rows ORDER BY ticker, date (sql/features_window.sql does).
+
+# Arrow schemas of the shipped SQL files, by file name. SQLite reports no types for
+# expression columns (LAG, AVG, ...), so the output types are declared here.
+SCHEMAS = {
+    "features_window.sql": pa.schema([("ticker", pa.string()), ("date", pa.string())] +
+                                     [(n, pa.float64()) for n in ["r_1d","lag1","lag2","lag3",
+                                                                  "roll_mean_20","roll_var_20"]]),
+}
+
+def infer_schema(names, cols):
+    # From the SQLite storage classes of the first batch: TEXT -> string, INTEGER -> int64,
+    # REAL (or INTEGER mixed with REAL) -> float64. A column that is all NULL cannot be typed.
+    fields = []
+    for n, c in zip(names, cols):
+        kinds = {type(v) for v in c if v is not None}
+        if not kinds:
+            raise SystemExit(f"build_features_sql: column {n!r} is all NULL in the first batch; "
+                             "add the SQL file's schema to SCHEMAS")
+        fields.append((n, pa.string() if str in kinds else pa.int64() if kinds == {int} else pa.float64()))
+    return pa.schema(fields)
+
+def sqlite_batches(con, sql, params, batch_rows=100_000, schema=None):
+    # schema=None infers the types from the first batch; later batches must fit them
+    cur = con.execute(sql, params)
+    names = [d[0] for d in cur.description]
+    if schema is not None and schema.names != names:
+        raise SystemExit(f"build_features_sql: query returns {names}, schema has {schema.names}")
+    while rows := cur.fetchmany(batch_rows):
+        cols = list(zip(*rows))
+        if schema is None:
+            schema = infer_schema(names, cols)
+        yield pa.record_batch([pa.array(c, type=f.type) for c, f in zip(cols, schema)], schema=schema)
+
+def add_zscore(batch):
+    col = lambda n: batch.column(n).to_numpy(zero_copy_only=False)  # nulls -> NaN
+    std = np.sqrt(np.clip(col("roll_var_20"), 0, None))
+    with np.errstate(invalid="ignore", divide="ignore"):
+        z = (col("r_1d") - col("roll_mean_20")) / np.where(std == 0, np.nan, std)
+    batch = batch.append_column("roll_std_20", pa.array(std, from_pandas=True))
+    return batch.append_column("zscore_20", pa.array(z, from_pandas=True))
+
+def head_mask(tickers, state, drop_head):
+    # Row number within ticker for a ticker-ordered stream; `state` carries the last ticker,
+    # its row count so far and the tickers already finished across batches.
+    n = len(tickers)
+    new = np.ones(n, dtype=bool)
+    if n > 1:
+        new[1:] = pc.not_equal(tickers.slice(1), tickers.slice(0, n - 1)).to_numpy(zero_copy_only=False)
+    starts = np.flatnonzero(new)
+    run = np.cumsum(new) - 1
+    rn = np.arange(n) - starts[run]
+    heads = tickers.take(pa.array(starts)).to_pylist()
+    if heads[0] == state.get("ticker"):
+        rn[run == 0] += state["n"]
+        heads = heads[1:]
+    if state.get("ticker") is not None:
+        state["seen"].add(state["ticker"])
+    if state["seen"].intersection(heads) or len(set(heads)) < len(heads):
+        raise SystemExit("build_features_sql: SQL must return rows ORDER BY ticker, date")
+    state["seen"].update(heads[:-1])
+    state["ticker"], state["n"] = tickers[n - 1].as_py(), int(rn[-1]) + 1
+    return rn >= drop_head
+
+def write_features(batches, out, drop_head=3):
+    writer, state, rows = None, {"seen": set()}, 0
+    try:
+        for b in batches:
+            if b.num_rows == 0:
+                continue
+            b = add_zscore(b).filter(pa.array(head_mask(b.column("ticker"), state, drop_head)))
+            if writer is None:
+                writer = pq.ParquetWriter(out, b.schema)
+            writer.write_batch(b)
+            rows += b.num_rows
+    finally:
+        if writer is not None:
+            writer.close()
+    if writer is None:  # empty result: still leave a readable file
+        pq.write_table(pa.table({}), out)
+    return rows
+
 def main():
     ap = argparse.ArgumentParser()
     ap.add_argument("--db", default="data/prices.db")
@@ -10,25 +99,27 @@ def main():
     ap.add_argument("--end",   default="2025-08-01")
     ap.add_argument("--out",   default="data/processed/features_sql.parquet")
     ap.add_argument("--drop-head", type=int, default=3)
+    ap.add_argument("--batch-rows", type=int, default=100_000, help="rows fetched per Arrow batch")
+    ap.add_argument("--backend", choices=BACKENDS, default="sqlite")
+    ap.add_argument("--parquet-root", default=str(PARQUET_ROOT))
     args = ap.parse_args()
 
     Path(args.out).parent.mkdir(parents=True, exist_ok=True)
-    con = sqlite3.connect(args.db)
-    con.create_function("SQRT", 1,
-        lambda x: math.sqrt(x) if x is not None and x >= 0 else None)
-
     sql = Path(args.sqlfile).read_text()
-    df = pd.read_sql_query(sql, con, params=[args.start, args.end])
-
-    df["roll_std_20"] = (df["roll_var_20"].clip(lower=0)).pow(0.5)
-    df["zscore_20"] = (df["r_1d"] - df["roll_mean_20"]) / df["roll_std_20"].replace(0, pd.NA)
-
-    df = (df.sort_values(["ticker","date"])
-            .groupby("ticker", group_keys=False)
-            .apply(lambda g: g.iloc[args.drop_head:]))
+    if args.backend == "sqlite":
+        con = sqlite3.connect(args.db)
+        con.create_function("SQRT", 1,
+            lambda x: math.sqrt(x) if x is not None and x >= 0 else None)
+        batches = sqlite_batches(con, sql, [args.start, args.end], args.batch_rows,
+                                 SCHEMAS.get(Path(args.sqlfile).name))
+        rows = write_features(batches, args.out, args.drop_head)
+        con.close()
+    else:  # same SQL file against the partitioned Parquet datasets; duckdb hands out Arrow batches
+        res = parquet_connection(args.parquet_root).execute(sql, [args.start, args.end])
+        fetch = getattr(res, "to_arrow_reader", None) or res.fetch_record_batch  # newer duckdb name
+        rows = write_features(fetch(args.batch_rows), args.out, args.drop_head)
 
-    df.to_parquet(args.out, index=False)
-    print("✅ Wrote", args.out, "Rows:", len(df))
+    print("✅ Wrote", args.out, "Rows:", rows)
 
 if __name__ == "__main__":
     main()
@@ -1,40 +1,79 @@
 #!/usr/bin/env python
-import numpy as np, pandas as pd, pathlib
+import argparse, json, math, sys, numpy as np, pandas as pd, pathlib
+from concurrent.futures import ProcessPoolExecutor
+from pandas.api.indexers import BaseIndexer
+
+ROOT = pathlib.Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))  # repo root, for src.projectname
+from src.projectname.cache import cached_stage
+from src.projectname.partitions import list_tickers, read_partition, write_partition
+from src.projectname.rolling import compensated_cumsum, rolling_stats, segments, window_stats
+
+class SegmentWindowIndexer(BaseIndexer):
+    # Trailing window over ticker-sorted rows that never reaches back past the row's own
+    # segment start (window_size=0 -> expanding from the segment start). These are exactly
+    # the bounds groupby().rolling()/expanding() hand to the same Cython kernels.
+    def get_window_bounds(self, num_values=0, min_periods=None, center=None, closed=None, step=None):
+        end = np.arange(1, num_values + 1, dtype=np.int64)
+        start = self.seg_start[:num_values]
+        if self.window_size:
+            start = np.maximum(start, end - self.window_size)
+        return start.astype(np.int64), end
+
+def seg_shift(a, k, seg_start):
+    # groupby().shift(k) for k>0 on contiguous segments
+    out = np.full(len(a), np.nan, dtype=a.dtype)
+    if k < len(a):
+        out[k:] = a[:-k]
+    out[np.arange(len(a)) - seg_start < k] = np.nan
+    return out
+
 def build_features(ret: pd.DataFrame, windows=(5,10,20), add_rsi=True):
-    g = ret.sort_values(["ticker","date"]).groupby("ticker", group_keys=False)
+    # One pass over ticker-sorted contiguous arrays: every feature is computed on the full
+    # column with segment-aware window bounds instead of a Python callback per ticker.
     out = ret.copy()
+    srt = ret.sort_values(["ticker","date"])
+    order = ret.index.get_indexer(srt.index)
+    seg_start, seg_id = segments(srt["ticker"].to_numpy())
+    n = len(srt)
+    r = srt["log_return"].reset_index(drop=True)
+
+    def put(name, values):  # scatter sorted-order values back to ret's row order
+        col = np.empty(n, dtype=np.asarray(values).dtype)
+        col[order] = values
+        out[name] = col
+
+    def ewm(s, **kw):
+        return s.groupby(seg_id, sort=False).ewm(adjust=False, **kw)
 
     # Lags of log_return (past info)
     for k in [1,2,3]:
-        out[f"lag{k}"] = g["log_return"].shift(k)
+        put(f"lag{k}", seg_shift(r.to_numpy(), k, seg_start))
 
     # Rolling mean/std and z-score of returns using past W days **including today**,
     # which is fine because target is r_{t+1}. No extra shift needed.
-    for W in windows:
-        rm = g["log_return"].rolling(W, min_periods=W).mean()
-        rsd= g["log_return"].rolling(W, min_periods=W).std()
-        out[f"roll_mean_{W}"] = rm.reset_index(level=0, drop=True) #level 0 is the grouping ticker
-        out[f"roll_std_{W}"]  = rsd.reset_index(level=0, drop=True)
-        out[f"zscore_{W}"]    = (out["log_return"] - out[f"roll_mean_{W}"]) / (out[f"roll_std_{W}"] + 1e-8)
+    # All windows share one set of prefix sums (see src/projectname/rolling.py).
+    for name, v in rolling_stats(r.to_numpy(), seg_start, windows, eps=1e-8).items():
+        put(name, v)
 
     # Expanding stats (from start to t): long-memory
-    out["exp_mean"] = g["log_return"].expanding(min_periods=20).mean().reset_index(level=0, drop=True)
-    out["exp_std"]  = g["log_return"].expanding(min_periods=20).std().reset_index(level=0, drop=True)
+    exp = r.rolling(SegmentWindowIndexer(window_size=0, seg_start=seg_start), min_periods=20)
+    put("exp_mean", exp.mean().to_numpy())
+    put("exp_std", exp.std().to_numpy())
 
     # Exponential weighted (decayed memory)
     for W in [10,20]:
-        out[f"ewm_mean_{W}"] = g["log_return"].apply(lambda s: s.ewm(span=W, adjust=False).mean())
-        out[f"ewm_std_{W}"]  = g["log_return"].apply(lambda s: s.ewm(span=W, adjust=False).std())
+        put(f"ewm_mean_{W}", ewm(r, span=W).mean().to_numpy())
+        put(f"ewm_std_{W}", ewm(r, span=W).std().to_numpy())
 
     # Optional RSI(14) using returns sign proxy (toy version)
     if add_rsi:
-        def rsi14(s):
-            delta = s.diff()
-            up = delta.clip(lower=0).ewm(alpha=1/14, adjust=False).mean()
-            dn = (-delta.clip(upper=0)).ewm(alpha=1/14, adjust=False).mean()
-            rs = up / (dn + 1e-12)
-            return 100 - (100 / (1 + rs))
-        out["rsi_14"] = g["adj_close"].apply(rsi14) if "adj_close" in out else g["log_return"].apply(rsi14)
+        px = (srt["adj_close"] if "adj_close" in out else srt["log_return"]).to_numpy()
+        delta = pd.Series(px - seg_shift(px, 1, seg_start))
+        up = ewm(delta.clip(lower=0), alpha=1/14).mean().to_numpy()
+        dn = ewm(-delta.clip(upper=0), alpha=1/14).mean().to_numpy()
+        rs = up / (dn + 1e-12)
+        put("rsi_14", 100 - (100 / (1 + rs)))
 
     # Cast dtypes
     for c in out.columns:
@@ -42,24 +81,225 @@ def build_features(ret: pd.DataFrame, windows=(5,10,20), add_rsi=True):
             out[c] = out[c].astype("float32")
     out["ticker"] = out["ticker"].astype("category")
     return out
-    
-import numpy as np, pandas as pd, pathlib
 
-def build():
+# --- incremental mode ---------------------------------------------------------------
+# Per-ticker state after the last row written to features_v1.parquet: a tail buffer of
+# raw returns and prefix sums for the lags/rolling window, plus the running state of
+# pandas' expanding and ewm(adjust=False) kernels, replayed here operation for operation
+# so appended rows come out bit-identical to a full rebuild. Assumes stored history is
+# not revised; rebuild without --incremental if it is.
+KEEP = ["date","ticker","log_return","r_1d","weekday","month",
+        "lag1","lag2","lag3","roll_mean_20","roll_std_20","zscore_20",
+        "ewm_mean_20","ewm_std_20","exp_mean","exp_std","adj_close","volume"]
+ROLL_W, EWM_SPAN, EXP_MINP = 20, 20, 20
+
+def new_state():
+    return {"date": None, "rows": 0, "shift": None, "tail": [], "p1": [[], []], "p2": [[], []],
+            "exp": None, "ewm": None}
+
+def exp_step(st, v, minp=EXP_MINP):
+    # roll_mean/roll_var add_mean/add_var (Kahan-compensated Welford) for one more row
+    n, sx, neg, cm, mx, ssq, cv, same, prev = st if st is not None else (0, 0.0, 0, 0.0, 0.0, 0.0, 0.0, 0, v)
+    if v == v:
+        n += 1
+        y = v - cm; t = sx + y; cm = t - sx - y; sx = t
+        neg += math.copysign(1.0, v) < 0
+        same = same + 1 if v == prev else 1
+        prev = v
+        pm = mx - cv; y = v - cv; t = y - mx; cv = t + mx - y
+        mx = mx + t / n
+        ssq = ssq + (v - pm) * (v - mx)
+    mean = var = math.nan
+    if n >= minp and n > 0:
+        mean = sx / n
+        if same >= n: mean = prev
+        elif neg == 0 and mean < 0: mean = 0.0
+        elif neg == n and mean > 0: mean = 0.0
+    if n >= max(minp, 1) and n > 1:
+        var = 0.0 if same >= n else ssq / (n - 1)
+    return (n, sx, neg, cm, mx, ssq, cv, same, prev), mean, math.sqrt(max(var, 0.)) if var == var else var
+
+def ewm_step(st, v, span=EWM_SPAN):
+    # ewm/ewmcov kernels with adjust=False, ignore_na=False, min_periods=1, bias=False
+    a = 1. / (1. + (span - 1) / 2); f = 1. - a
+    obs = v == v
+    if st is None:
+        mean, cov, sw, sw2, ow, nobs = (v if obs else math.nan), 0., 1., 1., 1., int(obs)
+    else:
+        mean, cov, sw, sw2, ow, nobs = st
+        nobs += obs
+        if mean == mean:
+            sw *= f; sw2 *= (f * f); ow *= f
+            if obs:
+                om = mean
+                if mean != v:
+                    mean = ((ow * om) + (a * v)) / (ow + a)
+                cov = ((ow * (cov + ((om - mean) * (om - mean)))) +
+                       (a * ((v - mean) * (v - mean)))) / (ow + a)
+                sw += a; sw2 += (a * a); ow += a
+                sw /= ow; sw2 /= (ow * ow); ow = 1.
+        elif obs:
+            mean = v
+    var = math.nan
+    if st is not None and nobs >= 1:
+        num = sw * sw; den = num - sw2
+        if den > 0: var = (num / den) * cov
+    return (mean, cov, sw, sw2, ow, nobs), (mean if nobs >= 1 else math.nan), \
+        (math.sqrt(max(var, 0.)) if var == var else var)
+
+def step_ticker(st, x):
+    # Features for one ticker's rows appended after state `st` (date order), and a function
+    # giving the state after the k-th of those rows
+    x = np.asarray(x, dtype=np.float64)
+    tail = np.asarray(st["tail"], dtype=np.float64)
+    T, m = len(tail), len(x)
+    ctx = np.r_[tail, x]
+    shift = st["shift"]
+    if shift is None and (~np.isnan(x)).any():
+        shift = float(x[~np.isnan(x)][0])  # the segment's first valid value, as rolling_stats uses
+    c = np.where(np.isnan(x), 0.0, x - (shift or 0.0))
+    P = []
+    for name, v in [("p1", c), ("p2", c * c)]:
+        hi, lo = st[name]
+        h, l = compensated_cumsum(v, (hi[-1], lo[-1]) if hi else (0.0, 0.0))
+        P.append((np.r_[hi, h[1:]], np.r_[lo, l[1:]]))
+    rows = np.arange(T, T + m)
+    f = window_stats(ctx, np.full(T + m, shift or 0.0), P[0], P[1], T - st["rows"], (ROLL_W,), rows=rows)
+    for k in [1,2,3]:
+        f[f"lag{k}"] = np.where(rows - k >= T - st["rows"], ctx[rows - k], np.nan)
+    exp_st, ewm_st, snaps = st["exp"], st["ewm"], []
+    cols = {k: np.empty(m) for k in ["exp_mean","exp_std",f"ewm_mean_{EWM_SPAN}",f"ewm_std_{EWM_SPAN}"]}
+    for i, v in enumerate(x.tolist()):
+        exp_st, cols["exp_mean"][i], cols["exp_std"][i] = exp_step(exp_st, v)
+        ewm_st, cols[f"ewm_mean_{EWM_SPAN}"][i], cols[f"ewm_std_{EWM_SPAN}"][i] = ewm_step(ewm_st, v)
+        snaps.append((exp_st, ewm_st))
+    f.update(cols)
+
+    def state_at(k, date):
+        e = T + k + 1
+        return {"date": pd.Timestamp(date).isoformat(), "rows": st["rows"] + k + 1, "shift": shift,
+                "tail": ctx[:e][-ROLL_W:].tolist(),
+                "p1": [P[0][0][:e][-ROLL_W:].tolist(), P[0][1][:e][-ROLL_W:].tolist()],
+                "p2": [P[1][0][:e][-ROLL_W:].tolist(), P[1][1][:e][-ROLL_W:].tolist()],
+                "exp": list(snaps[k][0]), "ewm": list(snaps[k][1])}
+    return f, state_at
+
+def float32_cols(df):
+    for c in df.columns:
+        if c not in ["date","ticker","weekday","month"] and pd.api.types.is_float_dtype(df[c]):
+            df[c] = df[c].astype("float32")
+    return df
+
+def update_features(ret, old=None, state=None):
+    # Rows after each ticker's stored state only; returns (features_v1 frame, new state).
+    # Equal to build_features(ret)[KEEP].dropna() sorted by (ticker, date).
+    state = dict(state or {})
+    srt = ret.sort_values(["ticker","date"])
+    last = pd.to_datetime(srt["ticker"].astype(str).map({t: st["date"] for t, st in state.items()}))
+    new = srt[~(pd.to_datetime(srt["date"]) <= last)].reset_index(drop=True)  # no state -> NaT -> kept
+    seg_start, _ = segments(new["ticker"].to_numpy())
+    heads = np.unique(seg_start)
+    x = new["log_return"].to_numpy()
+    feats, resume = {}, []
+    for s, e in zip(heads, np.r_[heads[1:], len(new)]):
+        t = str(new["ticker"].iat[s])
+        f, state_at = step_ticker(state.get(t) or new_state(), x[s:e])
+        for k, v in f.items():
+            feats.setdefault(k, []).append(v)
+        resume.append((t, s, e, state_at))
+    new = float32_cols(new.assign(**{k: np.concatenate(v) for k, v in feats.items()}))
+    new = new[[c for c in KEEP if c in new.columns]]
+    ok = new.notna().all(axis=1).to_numpy()
+    for t, s, e, state_at in resume:
+        hit = np.flatnonzero(ok[s:e])
+        if len(hit):  # next run resumes after the last row written
+            state[t] = state_at(int(hit[-1]), new["date"].iat[s + hit[-1]])
+    parts = [f for f in (old, new[ok]) if f is not None and len(f)] or [new[ok]]
+    fv1 = pd.concat(parts, ignore_index=True)
+    fv1["ticker"] = fv1["ticker"].astype(object).astype(ret["ticker"].astype("category").dtype)
+    return fv1.sort_values(["ticker","date"]).reset_index(drop=True), state
+
+def select_keep(fv1):
+    return fv1[[c for c in KEEP if c in fv1.columns]].dropna().sort_values(["ticker","date"])
+
+def build_batch(src, out, tickers):
+    # A batch of ticker partitions in, one partition per ticker out. Features never cross
+    # tickers, so one build_features call over the batch equals a call per ticker, but its
+    # fixed per-call cost (sorting, segment bounds, pandas window setup) is paid once.
+    ret = pd.concat([read_partition(f"{src}/returns_by_ticker", t) for t in tickers], ignore_index=True)
+    px = pd.concat([read_partition(f"{src}/prices_by_ticker", t, ["date","adj_close","volume"]) for t in tickers],
+                   ignore_index=True)
+    fv1 = select_keep(build_features(ret.merge(px, on=["ticker","date"], how="left")))
+    parts = dict(tuple(fv1.groupby("ticker", observed=True, sort=False)))
+    for t in tickers:
+        write_partition(parts.get(t, fv1.iloc[:0]).reset_index(drop=True), out, t)
+    return len(fv1)
+
+def build_by_ticker(src="data/processed", out="data/processed/features_v1_by_ticker", batch=64, jobs=1):
+    # Streaming: peak memory is one batch of tickers per worker, not the universe; each
+    # partition equals that ticker's rows of build(). With jobs > 1 whole batches go to worker
+    # processes: a task is (paths, ticker names) and returns a row count, so nothing large is
+    # pickled either way.
+    tickers = list_tickers(f"{src}/returns_by_ticker")
+    if not tickers: raise SystemExit(f"No partitions under {src}/returns_by_ticker.")
+    batches = [tickers[i:i+batch] for i in range(0, len(tickers), batch)]
+    if jobs <= 1 or len(batches) <= 1:
+        rows = sum(build_batch(src, out, b) for b in batches)
+    else:
+        with ProcessPoolExecutor(max_workers=jobs) as ex:
+            rows = sum(ex.map(build_batch, [src] * len(batches), [out] * len(batches), batches))
+    print(f"Wrote {out} ({len(tickers)} tickers, {rows} rows, batch={batch}, jobs={jobs})")
+    return tickers
+
+def load_inputs():
     p = pathlib.Path("data/processed/returns.parquet")
     if not p.exists(): raise SystemExit("Missing returns.parquet — finish Session 9.")
     prices = pd.read_parquet("data/processed/prices.parquet")
     ret = pd.read_parquet(p)
-    ret2 = ret.merge(prices[["ticker","date","adj_close","volume"]], on=["ticker","date"], how="left")
-    # (Paste the build_features() from class)
-    # ...
-    fv1 = build_features(ret2)
-    keep = ["date","ticker","log_return","r_1d","weekday","month",
-            "lag1","lag2","lag3","roll_mean_20","roll_std_20","zscore_20",
-            "ewm_mean_20","ewm_std_20","exp_mean","exp_std","adj_close","volume"]
-    keep = [c for c in keep if c in fv1.columns]
-    fv1 = fv1[keep].dropna().sort_values(["ticker","date"])
-    fv1.to_parquet("data/processed/features_v1.parquet", compression="zstd", index=False)
-    print("Wrote data/processed/features_v1.parquet", fv1.shape)
+    return ret.merge(prices[["ticker","date","adj_close","volume"]], on=["ticker","date"], how="left")
+
+# files whose content determines features_v1.parquet (artifact cache key, with the inputs)
+SOURCES = [pathlib.Path(__file__).resolve(), *(ROOT / "src/projectname" / m for m in ["rolling.py","partitions.py"])]
+INPUTS = ["data/processed/returns.parquet", "data/processed/prices.parquet"]
+
+def build(incremental=False, out="data/processed/features_v1.parquet",
+          state_path="data/processed/features_v1_state.json", cache=True):
+    out, state_path = pathlib.Path(out), pathlib.Path(state_path)
+    if not incremental and state_path.exists():
+        state_path.unlink()  # stale once the file is rebuilt; the next --incremental starts over
+    if cache and not incremental:  # incremental runs depend on the state file; never cached
+        return cached_stage("features_v1", INPUTS, [out], sources=SOURCES, params={"out": out},
+                            run=lambda: build(out=out, state_path=state_path, cache=False))
+    ret2 = load_inputs()
+    if incremental:
+        resume = out.exists() and state_path.exists()
+        old = pd.read_parquet(out) if resume else None
+        state = json.loads(state_path.read_text()) if resume else None
+        n0 = 0 if old is None else len(old)
+        fv1, state = update_features(ret2, old, state)
+        print(f"Incremental: +{len(fv1) - n0} rows ({'resumed' if resume else 'no state, full pass'})")
+    else:
+        fv1 = select_keep(build_features(ret2))
+    fv1.to_parquet(out, compression="zstd", index=False)
+    if incremental:
+        state_path.write_text(json.dumps(state))  # only after the rows it points past are on disk
+    print("Wrote", out, fv1.shape)
+
 if __name__ == "__main__":
-    build()
\ No newline at end of file
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--incremental", action="store_true",
+                    help="compute only dates after the stored per-ticker state and append them")
+    ap.add_argument("--state", default="data/processed/features_v1_state.json")
+    ap.add_argument("--by-ticker", action="store_true",
+                    help="stream ticker partitions from --src into --out-dir")
+    ap.add_argument("--src", default="data/processed", help="root holding returns_by_ticker/prices_by_ticker")
+    ap.add_argument("--out-dir", default="data/processed/features_v1_by_ticker")
+    ap.add_argument("--batch", type=int, default=64,
+                    help="with --by-ticker: tickers built per build_features call (bounds memory)")
+    ap.add_argument("--jobs", type=int, default=1, help="with --by-ticker: build batches in this many worker processes")
+    ap.add_argument("--no-cache", action="store_true", help="always recompute (skip .cache/artifacts)")
+    args, _ = ap.parse_known_args()
+    if args.by_ticker:
+        build_by_ticker(args.src, args.out_dir, batch=args.batch, jobs=args.jobs)
+    else:
+        build(incremental=args.incremental, state_path=args.state, cache=not args.no_cache)
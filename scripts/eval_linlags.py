@@ -2,27 +2,15 @@
 #!/usr/bin/env python
 from __future__ import annotations
 import argparse, numpy as np, pandas as pd
-from sklearn.pipeline import Pipeline
-from sklearn.preprocessing import StandardScaler
-from sklearn.linear_model import LinearRegression
 from pathlib import Path
+import sys
 
-def mae(y,yhat): return float(np.mean(np.abs(np.asarray(y)-np.asarray(yhat))))
-def smape(y,yhat,eps=1e-8):
-    y = np.asarray(y); yhat = np.asarray(yhat)
-    return float(np.mean(2*np.abs(y-yhat)/(np.abs(y)+np.abs(yhat)+eps)))
-def mase(y_true, y_pred, y_train_true, y_train_naive):
-    return float(mae(y_true, y_pred) / (mae(y_train_true, y_train_naive)+1e-12))
-
-def make_splits(dates, train_min, val_size, step, embargo):
-    u = np.array(sorted(pd.to_datetime(pd.Series(dates).unique())))
-    splits=[]; i=train_min-1; n=len(u)
-    while True:
-        if i>=n: break
-        a,b = u[0], u[i]; vs=i+embargo+1; ve=vs+val_size-1
-        if ve>=n: break
-        splits.append((a,b,u[vs],u[ve])); i+=step
-    return splits
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))  # repo root, for src.projectname
+from src.projectname.cache import cached_stage, file_digest
+from src.projectname.metrics import aggregate, group_mae, per_group
+from src.projectname.modelcache import fit_cached
+from src.projectname.ols import ExpandingOLS, fit, moments, predict
+from src.projectname.splitindex import SplitIndex, expanding_blocks, make_splits, map_splits
 
 def add_baselines(df, seasonality):
     out = df.copy()
@@ -30,21 +18,27 @@ def add_baselines(df, seasonality):
     out["yhat_s"] = out.groupby("ticker", observed = True)["log_return"].transform(lambda s: s.shift(seasonality-1)) if seasonality>1 else out["yhat_naive"]
     return out
 
-def fit_predict_lin(train_df, val_df, xcols):
-    from sklearn.linear_model import LinearRegression
-    from sklearn.preprocessing import StandardScaler
-    from sklearn.pipeline import Pipeline
-    preds=[]
-    for tkr, tr in train_df.groupby("ticker"):
-        va = val_df[val_df["ticker"]==tkr]
-        if len(tr)==0 or len(va)==0: continue
-        pipe = Pipeline([("scaler", StandardScaler()), ("lr", LinearRegression())])
-        pipe.fit(tr[xcols].values, tr["r_1d"].values)
-        yhat = pipe.predict(va[xcols].values)
-        out = va[["date","ticker","r_1d","log_return"]].copy()
-        out["yhat_linlags"] = yhat
-        preds.append(out)
-    return pd.concat(preds, ignore_index=True) if preds else pd.DataFrame()
+def fit_predict_lin(ix, X, tr, va, expanding=None, cache=None):
+    # one batched OLS over all tickers (same fit as a StandardScaler+LinearRegression per ticker)
+    # on the train block; an ExpandingOLS already holding the training rows replaces the refit,
+    # and with cache = {"data", "window", "xcols"} a model stored in .cache/models is reused.
+    # Returns predictions for the validation block rows, ticker by ticker (NaN where no fit).
+    y, codes = ix.col("r_1d"), ix.codes
+    if expanding is not None:
+        model = expanding.model()
+    elif cache is not None:
+        model = fit_cached(ix, X, y, tr, **cache)
+    else:
+        tp = ix.take(*tr)
+        model = fit(moments(X[tp], y[tp], codes[tp], len(ix.tickers)))
+    vp = ix.take(*va)
+    return predict(model, X[vp], codes[vp])
+
+# files whose content determines the reports (artifact cache key, with --features and the args):
+# this script and every src/projectname module it imports
+SOURCES = [Path(__file__).resolve(),
+           *(Path(__file__).resolve().parents[1] / "src/projectname" / m
+             for m in ["metrics.py","modelcache.py","ols.py","splitindex.py"])]
 
 def main():
     ap = argparse.ArgumentParser()
@@ -55,55 +49,64 @@ def main():
     ap.add_argument("--step", type=int, default=63)
     ap.add_argument("--embargo", type=int, default=5)
     ap.add_argument("--xcols", nargs="+", default=["lag1","lag2","lag3"])
+    ap.add_argument("--expanding", action="store_true",
+                    help="carry the per-ticker fit across splits, adding only the new training rows")
     ap.add_argument("--out-summary", default="reports/linlags_summary.csv")
     ap.add_argument("--out-per-ticker", default="reports/linlags_per_ticker_split{sid}.csv")
+    ap.add_argument("--jobs", type=int, default=1, help="evaluate splits in this many worker processes")
+    ap.add_argument("--no-cache", action="store_true", help="always recompute (skip .cache/artifacts)")
+    ap.add_argument("--model-cache", action="store_true", help="reuse the fitted models of earlier runs (.cache/models)")
     # args = ap.parse_args() # notworking in Colab
     args, unknown = ap.parse_known_args() # fix
     print("Parsed args:", args)
+    if args.expanding and args.jobs > 1:
+        ap.error("--expanding carries the fit from split to split; use it with --jobs 1")
+    if not args.no_cache:
+        params = {k: v for k, v in vars(args).items() if k not in ("no_cache", "model_cache", "jobs")}
+        return cached_stage("eval_linlags", [args.features], [], sources=SOURCES,
+                            params=params, run=lambda: evaluate(args))
+    return evaluate(args)
 
+def eval_split(ix, sid, split, args, lin=None):
+    a,b,c,d = split
+    X, r, lr = ix.col("X"), ix.col("r_1d"), ix.col("log_return")
+    tr, va = ix.bounds(a,b), ix.bounds(c,d)
+    cache = {"data": args.data, "window": (a,b), "xcols": args.xcols} if args.model_cache else None
+    yhat = fit_predict_lin(ix, X, tr, va, lin, cache)
+    # per-ticker metrics from one long table of the validation block
+    tp, vp = ix.take(*tr), ix.take(*va)
+    tp = tp[~np.isnan(r[tp])]
+    scale = group_mae(ix.codes[tp], r[tp], lr[tp], len(ix.tickers))  # MASE scale: naive error in training
+    vc = ix.codes[vp]
+    pt = per_group({"ticker": pd.Categorical.from_codes(vc, ix.tickers)}, r[vp], yhat, scale=scale[vc])
+    Path("reports").mkdir(exist_ok=True)
+    pt.assign(split=sid, model="lin_lags").to_csv(args.out_per_ticker.format(sid=sid), index=False)
 
+    return {"split":sid,"train_range":f"{a.date()}→{b.date()}","val_range":f"{c.date()}→{d.date()}",
+            "model":"lin_lags", **aggregate(pt)}
+
+def evaluate(args):
     df = pd.read_parquet(args.features).sort_values(["ticker","date"]).reset_index(drop=True)
+    args.data = file_digest(args.features) if args.model_cache else None  # model cache key
     df["ticker"] = df["ticker"].astype("category")
     splits = make_splits(df["date"], args.train_min, args.val_size, args.step, args.embargo)
     df = add_baselines(df, args.seasonality)
 
-    rows=[]
-    for sid, (a,b,c,d) in enumerate(splits, start=1):
-        tr = df[(df["date"]>=a)&(df["date"]<=b)]
-        va = df[(df["date"]>=c)&(df["date"]<=d)]
-        val_pred = fit_predict_lin(tr, va, args.xcols)
-        va = va.merge(val_pred[["date","ticker","yhat_linlags"]], on=["date","ticker"], how="left")
-        # per-ticker
-        pts=[]
-        for tkr, gv in va.groupby("ticker"):
-            gv = gv.dropna(subset=["r_1d","yhat_linlags"])
-            if len(gv)==0: continue
-            gt = tr[tr["ticker"]==tkr].dropna(subset=["r_1d"])
-            gt_naive = gt["log_return"]  # scale comparator for MASE
-            pts.append({"ticker":tkr,"n":int(len(gv)),
-                        "mae": mae(gv["r_1d"], gv["yhat_linlags"]),
-                        "smape": smape(gv["r_1d"], gv["yhat_linlags"]),
-                        "mase": mase(gv["r_1d"], gv["yhat_linlags"], gt["r_1d"], gt_naive)})
-        pt = pd.DataFrame(pts)
-        Path("reports").mkdir(exist_ok=True)
-        pt.assign(split=sid, model="lin_lags").to_csv(args.out_per_ticker.format(sid=sid), index=False)
-
-        # aggregate
-        if not pt.empty:
-            macro = pt[["mae","smape","mase"]].mean().to_dict()
-            w = pt["n"].to_numpy()
-            micro = {"micro_mae": float(np.average(pt["mae"], weights=w)),
-                     "micro_smape": float(np.average(pt["smape"], weights=w)),
-                     "micro_mase": float(np.average(pt["mase"], weights=w))}
-        else:
-            macro = {"mae":np.nan,"smape":np.nan,"mase":np.nan}
-            micro = {"micro_mae":np.nan,"micro_smape":np.nan,"micro_mase":np.nan}
-        rows.append({"split":sid,"train_range":f"{a.date()}→{b.date()}","val_range":f"{c.date()}→{d.date()}",
-                     "model":"lin_lags", "macro_mae":float(macro["mae"]), "macro_smape":float(macro["smape"]), "macro_mase":float(macro["mase"]),
-                     **micro})
+    ix = SplitIndex(df)
+    arrays = {"X": ix.values(args.xcols), "r_1d": ix.col("r_1d"), "log_return": ix.col("log_return")}
+    items = [(sid, sp, args) for sid, sp in enumerate(splits, start=1)]
+    if args.expanding:  # sequential: the fit is carried from one split to the next
+        ix.add_cols(arrays); X, r = arrays["X"], arrays["r_1d"]
+        lin, rows = ExpandingOLS(ix.tickers), []
+        for (sid, split, _), new in zip(items, expanding_blocks(ix, splits)):
+            lin.add_arrays(X[new], r[new], ix.codes[new])
+            rows.append(eval_split(ix, sid, split, args, lin))
+    else:  # splits are independent; workers memory-map the arrays, rows come back in split order
+        rows = map_splits(eval_split, items, ix, arrays, args.jobs)
 
     pd.DataFrame(rows).to_csv(args.out_summary, index=False)
     print("Wrote", args.out_summary)
+    return [args.out_summary] + [args.out_per_ticker.format(sid=sid) for sid in range(1, len(splits) + 1)]
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,79 @@
+#!/usr/bin/env python
+# Rolling-origin evaluation of several registered forecasters in one data pass: the features
+# are read, sorted and indexed once, then every split fits and scores all --models on the
+# same train/validation blocks. Adding a model = registering a Forecaster in
+# src/projectname/forecasters.py, not copying an eval script.
+from __future__ import annotations
+import argparse, sys
+import numpy as np, pandas as pd
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))  # repo root, for src.projectname
+from src.projectname.forecasters import REGISTRY, make
+from src.projectname.metrics import group_mae, per_group, summarize
+from src.projectname.splitindex import SplitIndex, make_splits, map_splits
+
+def build_models(args):
+    return [make(name, seasonality=args.seasonality, xcols=args.xcols) for name in args.models]
+
+def eval_split(ix, sid, split, args):
+    # fit + predict every model on this split's blocks, then score them all from one long table
+    a,b,c,d = split
+    r, lr, codes, k = ix.col("r_1d"), ix.col("log_return"), ix.codes, len(ix.tickers)
+    tp, vp = ix.take(*ix.bounds(a,b)), ix.take(*ix.bounds(c,d))
+    preds = []
+    for m in build_models(args):
+        m.fit({n: ix.col(n)[tp] for n in m.needs}, r[tp], codes[tp], k)
+        preds.append(m.predict({n: ix.col(n)[vp] for n in m.needs}, codes[vp]))
+    tp = tp[~np.isnan(r[tp])]
+    scale = group_mae(codes[tp], r[tp], lr[tp], k)  # MASE scale: naive error in training
+    vc, M = codes[vp], len(preds)
+    keys = {"model": pd.Categorical.from_codes(np.repeat(np.arange(M), len(vp)), list(args.models)),
+            "ticker": pd.Categorical.from_codes(np.tile(vc, M), ix.tickers)}
+    pt = per_group(keys, np.tile(r[vp], M), np.concatenate(preds), scale=np.tile(scale[vc], M))
+    Path(args.out_per_ticker).parent.mkdir(parents=True, exist_ok=True)
+    pt.assign(split=sid).to_csv(args.out_per_ticker.format(sid=sid), index=False)
+    summ = summarize(pt, ["model"]).astype({"model": str})
+    summ.insert(0, "split", sid)
+    summ.insert(1, "train_range", f"{a.date()}→{b.date()}")
+    summ.insert(2, "val_range", f"{c.date()}→{d.date()}")
+    return summ
+
+def evaluate(args):
+    models = build_models(args)
+    need = {"ticker","date","r_1d","log_return"} | {n for m in models for n in m.needs}
+    df = pd.read_parquet(args.features)
+    ix = SplitIndex(df[[c for c in df.columns if c in need]])
+    splits = make_splits(ix.dates, args.train_min, args.val_size, args.step, args.embargo)
+    arrays = {n: ix.col(n) for n in need - {"ticker","date"} if n in ix.df.columns}
+    for m in models:
+        arrays.update(m.prepare(ix))
+    rows = map_splits(eval_split, [(sid, sp, args) for sid, sp in enumerate(splits, start=1)], ix, arrays, args.jobs)
+    out = pd.concat(rows, ignore_index=True) if rows else pd.DataFrame()
+    Path(args.out_summary).parent.mkdir(parents=True, exist_ok=True)
+    out.to_csv(args.out_summary, index=False)
+    print("Wrote", args.out_summary, f"({len(splits)} splits x {len(models)} models)")
+    return out
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--features", default="data/processed/features_v1.parquet")
+    ap.add_argument("--models", default="naive,snaive,lin_lags",
+                    help=f"comma-separated subset of {','.join(REGISTRY)}")
+    ap.add_argument("--seasonality", type=int, default=5)
+    ap.add_argument("--xcols", nargs="+", default=["lag1","lag2","lag3"])
+    ap.add_argument("--train-min", type=int, default=252)
+    ap.add_argument("--val-size", type=int, default=63)
+    ap.add_argument("--step", type=int, default=63)
+    ap.add_argument("--embargo", type=int, default=5)
+    ap.add_argument("--jobs", type=int, default=1, help="evaluate splits in this many worker processes")
+    ap.add_argument("--out-summary", default="reports/models_summary.csv")
+    ap.add_argument("--out-per-ticker", default="reports/models_per_ticker_split{sid}.csv")
+    args, _ = ap.parse_known_args()
+    args.models = args.models.split(",")
+    if set(args.models) - set(REGISTRY):
+        ap.error(f"--models must be a subset of {','.join(REGISTRY)}")
+    evaluate(args)
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,32 @@
 #!/usr/bin/env python
-import argparse, sys, time
+import argparse, sys, time, threading, sqlite3
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 import pandas as pd, numpy as np
 
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))  # repo root, for src.projectname
+from src.projectname.sqlio import refresh_sector_daily
+
+class RateLimiter:
+    # Spaces out calls to one host: at most `rate` starts per second across all workers
+    def __init__(self, rate: float):
+        self.interval = 1.0 / rate if rate and rate > 0 else 0.0
+        self.lock = threading.Lock()
+        self.next_t = 0.0
+
+    def wait(self):
+        if not self.interval:
+            return
+        with self.lock:
+            now = time.monotonic()
+            start = max(now, self.next_t)
+            self.next_t = start + self.interval
+        if start > now:
+            time.sleep(start - now)
+
 def fetch_yf(ticker, start, end):
     import yfinance as yf
-    df = yf.download(ticker, start=start, end=end, auto_adjust=True, progress=False)
+    df = yf.download(ticker, start=start, end=end, auto_adjust=True, progress=False, threads=False)
     if df is None or df.empty:
         raise RuntimeError("empty")
     df = df.rename(columns=str.lower)[["close","volume"]]
@@ -20,39 +41,155 @@ def fetch_yf(ticker, start, end):
     df["ticker"] = ticker
     return df[["ticker","date","close","volume"]]
 
+def synthetic_prices(ticker, start, end):
+    idx = pd.bdate_range(start, end or pd.Timestamp.today().date())
+    rng = np.random.default_rng(42 + hash(ticker)%1000)
+    r = rng.normal(0, 0.01, len(idx))
+    price = 100*np.exp(np.cumsum(r))
+    vol = rng.integers(1e5, 5e6, len(idx))
+    return pd.DataFrame({"ticker": ticker, "date": idx, "close": price, "volume": vol})
+
+COLS = ["ticker","date","adj_close","volume","log_return"]
+
+def fetch_one(ticker, start, end, limiter=None, prev=None, synthetic=True):
+    # Returns (frame, status dict); never raises so one bad ticker cannot sink the batch.
+    # prev = (last_date, last_adj_close) switches to a delta fetch of the missing tail only;
+    # a delta fetch that fails (or finds no new bar yet) returns no rows, never synthetic ones;
+    # synthetic=False does the same for full fetches (new tickers of an --incremental run).
+    t0 = time.perf_counter()
+    none = lambda source, err="": (pd.DataFrame(columns=COLS), {"ticker": ticker, "source": source, "rows": 0,
+                                   "secs": round(time.perf_counter() - t0, 3), "error": err})
+    if prev is not None:
+        start = (pd.Timestamp(prev[0]) + pd.Timedelta(days=1)).strftime("%Y-%m-%d")
+        if pd.Timestamp(start) > pd.Timestamp(end or pd.Timestamp.today().date()):
+            return none("up-to-date")
+    try:
+        if limiter is not None:
+            limiter.wait()
+        df = fetch_yf(ticker, start, end or None)
+        source, err = "yfinance", ""
+    except Exception as e:
+        err = f"{type(e).__name__}: {e}"
+        if prev is not None or not synthetic:
+            return none("failed", err)  # incl. RuntimeError("empty"): no new bar yet
+        df = synthetic_prices(ticker, start, end)  # synthetic fallback, plain full fetches only
+        source = "synthetic"
+    df["date"] = pd.to_datetime(df["date"]).dt.date
+    df["adj_close"] = df["close"]
+    df = df.drop(columns=["close"])
+    if prev is not None:
+        df = df[df["date"] > pd.Timestamp(prev[0]).date()].reset_index(drop=True)
+        # first new bar's return is measured against the last stored close, not set to 0
+        lr = np.log(df["adj_close"]).diff()
+        if len(df):
+            lr.iloc[0] = np.log(df["adj_close"].iloc[0] / prev[1])
+        df["log_return"] = lr
+    else:
+        df["log_return"] = np.log(df["adj_close"]).diff().fillna(0.0)
+    return df, {"ticker": ticker, "source": source, "rows": len(df),
+                "secs": round(time.perf_counter() - t0, 3), "error": err}
+
+def fetch_all(tickers, start, end, workers=8, rate=0.0, last=None, synthetic=True):
+    # Fan tickers out to a bounded thread pool (downloads are I/O bound); results keep input order
+    limiter = RateLimiter(rate)
+    last = last or {}
+    job = lambda t: fetch_one(t, start, end, limiter, prev=last.get(t), synthetic=synthetic)
+    if workers <= 1:
+        results = [job(t) for t in tickers]
+    else:
+        with ThreadPoolExecutor(max_workers=workers) as ex:
+            results = list(ex.map(job, tickers))
+    frames = [df for df, _ in results]
+    status = pd.DataFrame([s for _, s in results])
+    return frames, status
+
+def last_bars_db(db_path):
+    # Last stored (date, adj_close) per ticker; served from the (ticker,date) primary key
+    con = sqlite3.connect(db_path)
+    try:
+        df = pd.read_sql_query("""
+            SELECT p.ticker, p.date, p.adj_close
+            FROM prices p
+            JOIN (SELECT ticker, MAX(date) AS date FROM prices GROUP BY ticker) m
+              ON p.ticker = m.ticker AND p.date = m.date
+        """, con)
+    finally:
+        con.close()
+    return {r.ticker: (r.date, float(r.adj_close)) for r in df.itertuples(index=False)}
+
+def last_bars_csv(csv_path):
+    df = pd.read_csv(csv_path, usecols=["ticker","date","adj_close"], parse_dates=["date"])
+    df = df.sort_values(["ticker","date"]).groupby("ticker").tail(1)
+    return {r.ticker: (r.date.strftime("%Y-%m-%d"), float(r.adj_close)) for r in df.itertuples(index=False)}
+
+def upsert_db(db_path, df):
+    sql = """
+        INSERT INTO prices(ticker,date,adj_close,volume,log_return) VALUES(?,?,?,?,?)
+        ON CONFLICT(ticker,date) DO UPDATE SET
+            adj_close = excluded.adj_close, volume = excluded.volume, log_return = excluded.log_return
+    """
+    rows = df.assign(date=pd.to_datetime(df["date"]).dt.strftime("%Y-%m-%d"),
+                     volume=df["volume"].astype("int64"))
+    con = sqlite3.connect(db_path)
+    try:
+        with con:
+            con.executemany(sql, rows[["ticker","date","adj_close","volume","log_return"]]
+                                 .itertuples(index=False, name=None))
+            refresh_sector_daily(con, rows["date"].min(), rows["date"].max())
+    finally:
+        con.close()
+
 def main():
     ap = argparse.ArgumentParser()
     ap.add_argument("--tickers", default="tickers_25.csv")
     ap.add_argument("--start", default="2020-01-01")
     ap.add_argument("--end", default="")
     ap.add_argument("--out", default="data/raw/prices.csv")
+    ap.add_argument("--workers", type=int, default=8, help="concurrent downloads (1 = serial)")
+    ap.add_argument("--rate", type=float, default=0.0,
+                    help="max requests/sec to the data host; default 0 = unlimited (only --workers bounds it)")
+    ap.add_argument("--timing-out", default="", help="optional CSV of per-ticker timing/status")
+    ap.add_argument("--incremental", action="store_true",
+                    help="fetch only bars after the last stored date per ticker and append/upsert them")
+    ap.add_argument("--db", default="data/prices.db",
+                    help="with --incremental: read last bars from (and upsert into) this DB if it exists")
     args = ap.parse_args()
 
     out = Path(args.out)
     out.parent.mkdir(parents=True, exist_ok=True)
     tickers = pd.read_csv(args.tickers)["ticker"].dropna().unique().tolist()
 
-    rows = []
-    for t in tickers:
-        try:
-            df = fetch_yf(t, args.start, args.end or None)
-        except Exception:
-            # synthetic fallback
-            idx = pd.bdate_range(args.start, args.end or pd.Timestamp.today().date())
-            rng = np.random.default_rng(42 + hash(t)%1000)
-            r = rng.normal(0, 0.01, len(idx))
-            price = 100*np.exp(np.cumsum(r))
-            vol = rng.integers(1e5, 5e6, len(idx))
-            df = pd.DataFrame({"ticker": t, "date": idx, "close": price, "volume": vol})
-        df["date"] = pd.to_datetime(df["date"]).dt.date
-        df["adj_close"] = df["close"]
-        df = df.drop(columns=["close"])
-        df["log_return"] = np.log(df["adj_close"]).diff().fillna(0.0)
-        rows.append(df)
+    last, use_db = None, False
+    if args.incremental:
+        use_db = Path(args.db).exists()
+        if use_db:
+            last = last_bars_db(args.db)
+        elif out.exists():
+            last = last_bars_csv(out)
+        print(f"Incremental: {len(last or {})} tickers with history ({'db' if use_db else 'csv'})")
+
+    t0 = time.perf_counter()
+    rows, status = fetch_all(tickers, args.start, args.end, workers=args.workers, rate=args.rate, last=last,
+                             synthetic=not args.incremental)  # never mix fake bars into stored history
+    wall = time.perf_counter() - t0
 
     allp = pd.concat(rows, ignore_index=True)
-    allp = allp[["ticker","date","adj_close","volume","log_return"]]
-    allp.to_csv(out, index=False)
+    allp = allp[COLS]
+    if args.incremental and out.exists():
+        allp.to_csv(out, mode="a", header=False, index=False)  # only new bars are written
+    else:
+        allp.to_csv(out, index=False)
+    if use_db and len(allp):
+        upsert_db(args.db, allp)
+
+    failed = status[status["source"].isin(["synthetic", "failed"])]
+    print(f"Fetched {len(tickers)} tickers in {wall:.1f}s (workers={args.workers}, "
+          f"sum of per-ticker time {status['secs'].sum():.1f}s, slowest {status['secs'].max():.2f}s)")
+    for r in failed.itertuples(index=False):
+        print(f"  {r.source} {r.ticker}: {r.error} ({r.secs:.2f}s)")
+    if args.timing_out:
+        Path(args.timing_out).parent.mkdir(parents=True, exist_ok=True)
+        status.to_csv(args.timing_out, index=False)
     print("Wrote", out, "rows:", len(allp))
 
 if __name__ == "__main__":
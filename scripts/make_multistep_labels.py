@@ -1,22 +1,106 @@
 # save to scripts/make_multistep_labels.py
 from __future__ import annotations
+import argparse, sys
 import pandas as pd, numpy as np
 from pathlib import Path
 
-def make_multistep(in_parquet="data/processed/returns.parquet", horizons=(5,)):
-    df = pd.read_parquet(in_parquet).sort_values(["ticker","date"]).reset_index(drop=True)
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))  # repo root, for src.projectname
+from src.projectname.cache import cached_stage
+from src.projectname.partitions import list_tickers, read_partition, write_partition
+from src.projectname.rolling import segments
+
+LABELS = ("sum", "max", "min", "vol")
+
+def _reverse_cumsum(v, heads, ends):
+    # per-ticker suffix sums with a 0 after each ticker: out[t + k] = v[t:e].sum() for row t
+    # of the k-th ticker, whose rows are [s, e)
+    out = np.zeros(len(v) + len(heads))
+    for k, (s, e) in enumerate(zip(heads, ends)):
+        out[s + k:e + k] = np.cumsum(v[s:e][::-1])[::-1]
+    return out
+
+def _forward_window(a, H, fn):
+    # fn ("min"/"max") over a[j:j+H] at every j (NaN where the window runs off the end)
+    return getattr(pd.Series(a[::-1]).rolling(H), fn)().to_numpy()[::-1]
+
+def add_multistep(df, horizons=(5,), labels=("sum",)):
+    # All horizons come from one per-ticker reverse cumulative sum G of log_return:
+    #   r_Hd[t]    = G[t+1] - G[t+H+1]                  (sum of the next H returns)
+    #   rmax_Hd[t] = G[t+1] - min(G[t+2 .. t+H+1])      (best cumulative return within H days)
+    #   rmin_Hd[t] = G[t+1] - max(G[t+2 .. t+H+1])      (worst cumulative return within H days)
+    #   vol_Hd[t]  = std (ddof=1) of the next H returns, from a second sum of squares
+    # so each label is O(n) regardless of H. Labels are NaN when fewer than H rows (or a
+    # NaN return) lie ahead within the ticker, as with the shift(-1..-H) definition.
+    df = df.sort_values(["ticker","date"]).reset_index(drop=True)
+    x = df["log_return"].to_numpy(dtype=np.float64)  # labels are float64; the column keeps its dtype
+    n = len(x)
+    seg_start, seg_id = segments(df["ticker"].to_numpy())
+    heads = np.unique(seg_start)
+    ends = np.r_[heads[1:], n].astype(np.int64)
+    p = np.arange(n) + seg_id  # row -> slot in the working arrays
+    ahead = np.repeat(ends, ends - heads) - np.arange(n) - 1  # rows after t in its ticker
+    nan = np.isnan(x)
+    xz = np.where(nan, 0.0, x)
+    G = _reverse_cumsum(xz, heads, ends)
+    bad = nan & (np.arange(n) != seg_start)  # a ticker's first return is never ahead of a row
+    K = _reverse_cumsum(bad.astype(np.float64), heads, ends) if bad.any() else None
+    Q = _reverse_cumsum(xz * xz, heads, ends) if "vol" in labels else None
+    last = len(G) - 1
     for H in horizons:
-        # r_Hd = sum of next H log returns: shift(-1) ... shift(-H): accumulative log return over H days
-        s = df.groupby("ticker")["log_return"]
-        acc = None  # initialize an accumulator 
-        for h in range(1, H+1):
-            sh = s.shift(-h)
-            acc = sh if acc is None else (acc + sh)  # accumulative 
-        df[f"r_{H}d"] = acc
-    out = df
+        a, b = p + 1, np.minimum(p + H + 1, last)
+        ok = ahead >= H
+        if K is not None:
+            ok &= (K[a] - K[b]) == 0
+        S = G[a] - G[b]
+        if "sum" in labels:
+            # r_Hd = sum of next H log returns: shift(-1) ... shift(-H): accumulative log return over H days
+            df[f"r_{H}d"] = np.where(ok, S, np.nan)
+        for name, fn in [("rmax", "min"), ("rmin", "max")]:
+            if name[1:] in labels:
+                ext = _forward_window(G, H, fn)[np.minimum(p + 2, last)]
+                df[f"{name}_{H}d"] = np.where(ok, G[a] - ext, np.nan)
+        if Q is not None:
+            with np.errstate(invalid="ignore", divide="ignore"):
+                var = np.clip((Q[a] - Q[b] - S * S / H) / (H - 1), 0.0, None) if H > 1 else np.full(n, np.nan)
+            df[f"vol_{H}d"] = np.where(ok, np.sqrt(var), np.nan)
+    return df
+
+# files whose content determines returns_multistep.parquet (artifact cache key, with the input)
+SOURCES = [Path(__file__).resolve(), *(ROOT / "src/projectname" / m for m in ["partitions.py","rolling.py"])]
+
+def make_multistep(in_parquet="data/processed/returns.parquet", horizons=(5,), labels=("sum",), cache=True):
+    if cache:
+        return cached_stage("returns_multistep", [in_parquet], ["data/processed/returns_multistep.parquet"],
+                            sources=SOURCES,
+                            params={"horizons": list(horizons), "labels": list(labels)},
+                            run=lambda: make_multistep(in_parquet, horizons, labels, cache=False))
+    out = add_multistep(pd.read_parquet(in_parquet), horizons, labels)
     Path("data/processed").mkdir(parents=True, exist_ok=True)
     out.to_parquet("data/processed/returns_multistep.parquet", compression="zstd", index=False)
     print("Wrote data/processed/returns_multistep.parquet", out.shape)
 
+def make_multistep_by_ticker(src="data/processed/returns_by_ticker",
+                             out="data/processed/returns_multistep_by_ticker", horizons=(5,), labels=("sum",)):
+    # Labels only look ahead within a ticker, so each partition is built on its own
+    tickers = list_tickers(src)
+    for t in tickers:
+        write_partition(add_multistep(read_partition(src, t), horizons, labels), out, t)
+    print("Wrote", out, "tickers:", len(tickers))
+
 if __name__ == "__main__":
-    make_multistep()
\ No newline at end of file
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--horizons", default="5", help="comma-separated, e.g. 1,5,10,21,63")
+    ap.add_argument("--labels", default="sum", help=f"comma-separated subset of {','.join(LABELS)}")
+    ap.add_argument("--by-ticker", action="store_true",
+                    help="stream returns_by_ticker partitions into returns_multistep_by_ticker")
+    ap.add_argument("--no-cache", action="store_true", help="always recompute (skip .cache/artifacts)")
+    args, _ = ap.parse_known_args()
+    hs = tuple(int(h) for h in args.horizons.split(","))
+    labels = tuple(args.labels.split(","))
+    if set(labels) - set(LABELS):
+        ap.error(f"--labels must be a subset of {LABELS}")
+    if args.by_ticker:
+        make_multistep_by_ticker(horizons=hs, labels=labels)
+    else:
+        make_multistep(horizons=hs, labels=labels, cache=not args.no_cache)
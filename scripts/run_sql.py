@@ -1,8 +1,54 @@
 # scripts/run_sql.py
 #!/usr/bin/env python
-import argparse, sqlite3, pandas as pd
+import argparse, sys, sqlite3, json, re, time, pandas as pd
+from datetime import datetime, timezone
 from pathlib import Path
 
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))  # repo root, for src.projectname
+from src.projectname.sqlio import BACKENDS, PARQUET_ROOT, query_df
+
+def statements(sql):
+    # split a .sql file on ';', dropping chunks that are only comments/whitespace
+    out = []
+    for chunk in sql.split(";"):
+        if re.sub(r"--[^\n]*", "", chunk).strip():
+            out.append(chunk.strip())
+    return out
+
+def explain(con, sql, params=None):
+    # EXPLAIN QUERY PLAN for each statement; a bare "SCAN t" (no index, not a subquery) reads the whole table
+    rows = []
+    for i, stmt in enumerate(statements(sql), start=1):
+        for _, _, _, detail in con.execute("EXPLAIN QUERY PLAN " + stmt, params or []).fetchall():
+            rows.append({"stmt": i, "detail": detail,
+                         "full_scan": re.fullmatch(r"SCAN (TABLE )?\w+( AS \w+)?", detail) is not None})
+    return pd.DataFrame(rows)
+
+def install_slow_log(con, log_path, threshold_ms, db="", every=1000):
+    # set_trace_callback marks each statement's start; the progress handler stamps the last
+    # moment SQLite was still working on it (every `every` VM steps). Statements whose
+    # engine time reaches threshold_ms are appended to log_path as JSON lines.
+    st = {"sql": None, "t0": 0.0, "t1": 0.0}
+    def flush():
+        if st["sql"] is not None:
+            ms = (st["t1"] - st["t0"]) * 1000
+            if ms >= threshold_ms:
+                Path(log_path).parent.mkdir(parents=True, exist_ok=True)
+                with open(log_path, "a") as f:
+                    f.write(json.dumps({"ts": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+                                        "db": str(db), "ms": round(ms, 3),
+                                        "sql": st["sql"]}) + "\n")
+        st["sql"] = None
+    def on_trace(stmt):
+        flush()
+        st["sql"] = stmt; st["t0"] = st["t1"] = time.perf_counter()
+    def on_progress():
+        st["t1"] = time.perf_counter()
+        return 0  # never interrupt
+    con.set_trace_callback(on_trace)
+    con.set_progress_handler(on_progress, every)
+    return flush  # call after the last statement to log it too
+
 def main():
     ap = argparse.ArgumentParser()
     ap.add_argument("--db", default="data/prices.db")
@@ -10,13 +56,37 @@ def main():
     ap.add_argument("--sqlfile", default="sql/sector_top_moves.sql")
     ap.add_argument("--params", nargs="*", default=[])
     ap.add_argument("--out", default="")
+    ap.add_argument("--backend", choices=BACKENDS, default="sqlite",
+                    help="sqlite = --db file; parquet = partitioned datasets under --parquet-root")
+    ap.add_argument("--parquet-root", default=str(PARQUET_ROOT))
+    ap.add_argument("--explain", action="store_true",
+                    help="print EXPLAIN QUERY PLAN (sqlite) and flag full-table scans instead of running")
+    ap.add_argument("--slow-log", default="", help="append statements slower than --slow-ms here (JSONL)")
+    ap.add_argument("--slow-ms", type=float, default=100.0)
     # args = ap.parse_args()
     args, _ = ap.parse_known_args()
+    if args.backend != "sqlite" and (args.explain or args.slow_log):
+        ap.error("--explain and --slow-log inspect SQLite statements; use them with --backend sqlite")
 
     sql = Path(args.sqlfile).read_text()
-    con = sqlite3.connect(args.db)
-    df = pd.read_sql_query(sql, con, params=args.params or None)
-    con.close()
+    if args.backend == "sqlite" and args.explain:
+        con = sqlite3.connect(args.db)
+        plan = explain(con, sql, args.params)
+        con.close()
+        for r in plan.itertuples(index=False):
+            print(f"[{r.stmt}] {'FULL SCAN  ' if r.full_scan else '           '}{r.detail}")
+        if plan["full_scan"].any():
+            print(f"Warning: {int(plan['full_scan'].sum())} full-table scan step(s)")
+        return
+    if args.backend == "sqlite":
+        con = sqlite3.connect(args.db)
+        flush = install_slow_log(con, args.slow_log, args.slow_ms, db=args.db) if args.slow_log else None
+        df = pd.read_sql_query(sql, con, params=args.params or None)
+        if flush:
+            flush()
+        con.close()
+    else:
+        df = query_df(sql, args.params or None, backend=args.backend, parquet_root=args.parquet_root)
     if args.out:
         Path(args.out).parent.mkdir(parents=True, exist_ok=True)
         df.to_csv(args.out, index=False)
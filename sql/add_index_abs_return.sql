@@ -0,0 +1,2 @@
+-- sql/add_index_abs_return.sql  (for databases built before build_db.py created it)
+CREATE INDEX IF NOT EXISTS idx_prices_abs_return ON prices(ABS(log_return));
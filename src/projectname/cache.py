@@ -0,0 +1,127 @@
+from __future__ import annotations
+import hashlib, json, os, shutil, tempfile, time
+from pathlib import Path
+
+# Content-addressed cache for pipeline stages. A stage's key hashes the bytes of its input
+# files, the source files that produce it and its parameters; if an entry for that key
+# exists its outputs are restored instead of recomputed. Entries live under CACHE_DIR and
+# are evicted least-recently-used first once the cache grows past MAX_BYTES.
+CACHE_DIR = Path(".cache/artifacts")
+MAX_BYTES = 2 * 1024**3
+_CHUNK = 1 << 20
+
+def _sha_file(path: Path) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(_CHUNK), b""):
+            h.update(block)
+    return h.hexdigest()
+
+def file_digest(path: str | Path, memo: dict | None = None) -> str:
+    # sha256 of a file's bytes (a directory hashes its files' relative paths + digests);
+    # `memo` maps (path, size, mtime_ns) -> digest so unchanged big inputs are not re-read
+    p = Path(path)
+    if p.is_dir():
+        h = hashlib.sha256()
+        for f in sorted(x for x in p.rglob("*") if x.is_file()):
+            h.update(f.relative_to(p).as_posix().encode())
+            h.update(file_digest(f, memo).encode())
+        return h.hexdigest()
+    if not p.exists():
+        return "missing"
+    st = p.stat()
+    k = f"{p.resolve()}|{st.st_size}|{st.st_mtime_ns}"
+    if memo is not None and k in memo:
+        return memo[k]
+    d = _sha_file(p)
+    if memo is not None:
+        memo[k] = d
+    return d
+
+def stage_key(name: str, inputs: list, sources: list, params: dict, memo: dict | None = None) -> str:
+    # content only: the same bytes at another path (or checkout) give the same key
+    h = hashlib.sha256(name.encode())
+    for group in (inputs, sources):
+        h.update(str(len(group)).encode())
+        for p in group:
+            h.update(file_digest(p, memo).encode())
+    h.update(json.dumps(params, sort_keys=True, default=str).encode())
+    return h.hexdigest()[:32]
+
+def _load_memo(cache_dir: Path) -> dict:
+    try:
+        return json.loads((cache_dir / "digests.json").read_text())
+    except (OSError, ValueError):
+        return {}
+
+def _fresh(k: str) -> bool:
+    path, size, mtime = k.rsplit("|", 2)
+    try:
+        st = os.stat(path)
+    except OSError:
+        return False
+    return st.st_size == int(size) and st.st_mtime_ns == int(mtime)
+
+def _save_memo(cache_dir: Path, memo: dict) -> None:
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    tmp = cache_dir / f".digests.{os.getpid()}.tmp"
+    tmp.write_text(json.dumps({k: v for k, v in memo.items() if _fresh(k)}))
+    os.replace(tmp, cache_dir / "digests.json")
+
+def _entry_size(d: Path) -> int:
+    return sum(f.stat().st_size for f in d.rglob("*") if f.is_file())
+
+def evict(cache_dir: str | Path = CACHE_DIR, max_bytes: int = MAX_BYTES) -> list[str]:
+    # Drop least-recently-used entries (entry mtime is bumped on every hit) until under max_bytes
+    cache_dir = Path(cache_dir)
+    entries = sorted((d for d in cache_dir.iterdir() if d.is_dir() and not d.name.startswith(".")),
+                     key=lambda d: d.stat().st_mtime) if cache_dir.exists() else []
+    sizes = {d: _entry_size(d) for d in entries}
+    total, dropped = sum(sizes.values()), []
+    for d in entries:
+        if total <= max_bytes:
+            break
+        shutil.rmtree(d, ignore_errors=True)
+        total -= sizes[d]; dropped.append(d.name)
+    return dropped
+
+def cached_stage(name: str, inputs, outputs, run, sources=(), params: dict | None = None,
+                 cache_dir: str | Path = CACHE_DIR, max_bytes: int = MAX_BYTES) -> bool:
+    # Run `run()` unless an entry for this exact (inputs, sources, params) exists, in which
+    # case `outputs` are restored from it. `run` may return the list of files it wrote when
+    # they are not known up front. Returns True on a cache hit.
+    cache_dir = Path(cache_dir)
+    memo = _load_memo(cache_dir)
+    key = stage_key(name, list(inputs), list(sources), params or {}, memo)
+    entry = cache_dir / key
+    manifest = entry / "manifest.json"
+    if manifest.exists():
+        files, restored = json.loads(manifest.read_text())["files"], 0
+        for i, (dest, digest) in enumerate(files):
+            if file_digest(dest, memo) != digest:
+                Path(dest).parent.mkdir(parents=True, exist_ok=True)
+                shutil.copyfile(entry / str(i), dest)  # fresh mtime, so make sees it as new
+                restored += 1
+        os.utime(entry)  # LRU
+        _save_memo(cache_dir, memo)
+        print(f"[cache] {name}: hit {key[:12]}, {len(files)} output(s) up to date ({restored} restored)")
+        return True
+
+    t0 = time.perf_counter()
+    written = run() or outputs
+    secs = time.perf_counter() - t0
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    tmp = Path(tempfile.mkdtemp(prefix=".tmp-", dir=cache_dir))
+    files = []
+    for i, dest in enumerate(written):
+        shutil.copyfile(dest, tmp / str(i))
+        files.append([Path(dest).as_posix(), file_digest(dest, memo)])
+    (tmp / "manifest.json").write_text(json.dumps({"stage": name, "files": files, "params": params,
+                                                   "secs": round(secs, 3)}, default=str))
+    try:
+        os.replace(tmp, entry)
+    except OSError:  # another process stored the same key first
+        shutil.rmtree(tmp, ignore_errors=True)
+    _save_memo(cache_dir, memo)
+    evict(cache_dir, max_bytes)
+    return False
@@ -0,0 +1,84 @@
+from __future__ import annotations
+import numpy as np
+
+from src.projectname.ols import fit as ols_fit, moments, predict as ols_predict
+
+# Pluggable forecasters for the rolling-origin harness (scripts/eval_models.py). A model sees
+# array blocks, not DataFrames: `cols` maps each column it `needs` to the rows of the block
+# (ticker-sorted), `codes` gives every row's ticker code in [0, k). prepare() runs once on the
+# whole SplitIndex for columns that need history before a block starts (e.g. seasonal lags)
+# and returns them as extra full-length columns.
+REGISTRY: dict[str, type] = {}
+
+def register(name):
+    def deco(cls):
+        cls.name = name
+        REGISTRY[name] = cls
+        return cls
+    return deco
+
+def make(name: str, **params):
+    if name not in REGISTRY:
+        raise ValueError(f"unknown model {name!r}; expected one of {sorted(REGISTRY)}")
+    return REGISTRY[name](**params)
+
+def shift_within(a, codes, k):
+    # a shifted down k rows inside each ticker run (NaN where that crosses a ticker start)
+    j = np.arange(len(a)) - k
+    same = (j >= 0) & (codes[np.maximum(j, 0)] == codes)
+    return np.where(same, a[np.maximum(j, 0)], np.nan)
+
+class Forecaster:
+    name = ""
+    needs: tuple = ()
+
+    def __init__(self, **_):  # every model gets the harness's params and keeps the ones it uses
+        pass
+
+    def prepare(self, ix) -> dict:
+        return {}
+
+    def fit(self, cols: dict, y, codes, k: int):
+        return self
+
+    def predict(self, cols: dict, codes):
+        raise NotImplementedError
+
+@register("naive")
+class Naive(Forecaster):
+    # tomorrow's return = today's
+    needs = ("log_return",)
+
+    def predict(self, cols, codes):
+        return np.asarray(cols["log_return"], dtype=np.float64)
+
+@register("snaive")
+class SeasonalNaive(Forecaster):
+    # the return `seasonality` - 1 rows back, as baselines_eval's yhat_s
+    def __init__(self, seasonality: int = 5, **_):
+        self.s = seasonality
+        self.needs = (f"yhat_s{seasonality}",)
+
+    def prepare(self, ix):
+        lr = ix.col("log_return")
+        return {self.needs[0]: shift_within(lr, ix.codes, self.s - 1) if self.s > 1 else lr}
+
+    def predict(self, cols, codes):
+        return np.asarray(cols[self.needs[0]], dtype=np.float64)
+
+@register("lin_lags")
+class LinLags(Forecaster):
+    # per-ticker StandardScaler + OLS on the lag columns (batched, see ols.py)
+    def __init__(self, xcols=("lag1", "lag2", "lag3"), **_):
+        self.xcols = tuple(xcols)
+        self.needs = self.xcols
+
+    def _X(self, cols):
+        return np.column_stack([np.asarray(cols[c], dtype=np.float64) for c in self.xcols])
+
+    def fit(self, cols, y, codes, k):
+        self.model = ols_fit(moments(self._X(cols), y, codes, k))
+        return self
+
+    def predict(self, cols, codes):
+        return ols_predict(self.model, self._X(cols), codes)
@@ -0,0 +1,63 @@
+from __future__ import annotations
+import hashlib, os, shutil, tempfile
+from pathlib import Path
+import numpy as np
+
+from src.projectname.cache import evict
+from src.projectname.ols import fit, moments
+
+# Opt-in on-disk cache of fitted lin-lags models, one entry per (split, model). An entry is
+# keyed by the content digest of the features file (computed once per run), the train
+# window, the feature columns, the tickers and every ticker's train row range in the sorted
+# SplitIndex, so nothing proportional to the training data is hashed per split. It holds one
+# float64 array, a row [n, intercept, mu..., scale..., beta...] per ticker, in a directory
+# under MODEL_DIR so that cache.evict can drop entries least-recently-used first.
+MODEL_DIR = Path(".cache/models")
+MAX_BYTES = 64 * 1024**2
+
+def model_key(name, data, window, xcols, tickers, tr) -> str:
+    h = hashlib.sha256(f"{name}|{data}|{window[0]}|{window[1]}|{','.join(xcols)}|{','.join(map(str, tickers))}".encode())
+    for a in tr:
+        h.update(np.ascontiguousarray(a, dtype=np.int64).tobytes())
+    return h.hexdigest()[:32]
+
+def _pack(model) -> np.ndarray:
+    return np.column_stack([model["n"], model["intercept"], model["mu"], model["scale"], model["beta"]])
+
+def _unpack(rows, p) -> dict:
+    return {"n": rows[:, 0], "intercept": rows[:, 1], "mu": rows[:, 2:2+p], "scale": rows[:, 2+p:2+2*p],
+            "beta": rows[:, 2+2*p:]}
+
+def _load(entry: Path, shape):
+    try:
+        rows = np.load(entry / "model.npy", allow_pickle=False)
+    except (OSError, ValueError):
+        return None
+    if rows.shape != shape:
+        return None
+    os.utime(entry)  # LRU
+    return rows
+
+def _save(entry: Path, rows) -> None:
+    entry.parent.mkdir(parents=True, exist_ok=True)
+    tmp = Path(tempfile.mkdtemp(prefix=".tmp-", dir=entry.parent))
+    np.save(tmp / "model.npy", rows, allow_pickle=False)
+    try:
+        os.replace(tmp, entry)
+    except OSError:  # another process stored the same key first
+        shutil.rmtree(tmp, ignore_errors=True)
+
+def fit_cached(ix, X, y, tr, data: str, window, xcols, cache_dir: str | Path = MODEL_DIR,
+               max_bytes: int = MAX_BYTES) -> dict:
+    # ols.fit(moments(...)) on the train block tr = per-ticker (lo, hi) of a SplitIndex built
+    # from the features file with digest `data`, read from / written to the cache
+    cache_dir = Path(cache_dir)
+    k, p = len(ix.tickers), len(xcols)
+    entry = cache_dir / model_key("lin_lags", data, window, xcols, ix.tickers, tr)
+    rows = _load(entry, (k, 2 + 3*p))
+    if rows is None:
+        tp = ix.take(*tr)
+        rows = _pack(fit(moments(X[tp], y[tp], ix.codes[tp], k)))
+        _save(entry, rows)
+        evict(cache_dir, max_bytes)
+    return _unpack(rows, p)
@@ -0,0 +1,75 @@
+from __future__ import annotations
+import numpy as np, pandas as pd
+
+# Batched per-ticker OLS. Equivalent to fitting Pipeline(StandardScaler(), LinearRegression())
+# separately for every group, but all groups come from one set of grouped reductions: bincount
+# gives each group's n, sum x, sum y, X'X and X'y, the scaler and the standardized normal
+# equations follow from those, and every group is solved at once with a stacked np.linalg.solve.
+# Moments add, so a model can also be grown row block by row block (expanding windows).
+
+def moments(X, y, codes, k: int) -> dict:
+    # sufficient statistics per group code in [0, k); rows with a NaN in X or y are skipped
+    X = np.asarray(X, dtype=np.float64).reshape(len(codes), -1)
+    y = np.asarray(y, dtype=np.float64)
+    ok = np.isfinite(X).all(axis=1) & np.isfinite(y)
+    X, y, codes = X[ok], y[ok], np.asarray(codes)[ok]
+    p = X.shape[1]
+    tot = lambda w=None: np.bincount(codes, w, minlength=k).astype(np.float64)
+    sxx = np.empty((k, p, p))
+    for i in range(p):
+        for j in range(i, p):
+            sxx[:, i, j] = sxx[:, j, i] = tot(X[:, i] * X[:, j])
+    return {"n": tot(), "sx": np.stack([tot(X[:, j]) for j in range(p)], axis=1).reshape(k, p),
+            "sy": tot(y), "sxx": sxx, "sxy": np.stack([tot(X[:, j] * y) for j in range(p)], axis=1).reshape(k, p)}
+
+def add_moments(a: dict, b: dict) -> dict:
+    return {key: a[key] + b[key] for key in a}
+
+def _solve(A, b):
+    # stacked solve; singular groups (constant features, fewer rows than columns) take the
+    # minimum-norm solution, as LinearRegression's lstsq does
+    beta = np.zeros_like(b)
+    with np.errstate(all="ignore"):
+        cond = np.linalg.cond(A) if len(A) and A.shape[1] else np.zeros(len(A))
+    good = np.isfinite(cond) & (cond < 1e12)
+    if good.any():
+        beta[good] = np.linalg.solve(A[good], b[good][..., None])[..., 0]
+    if (~good).any():
+        beta[~good] = (np.linalg.pinv(A[~good]) @ b[~good][..., None])[..., 0]
+    return beta
+
+def fit(m: dict) -> dict:
+    n = m["n"]
+    nn = np.where(n > 0, n, 1.0)[:, None]
+    mu, ybar = m["sx"] / nn, m["sy"] / nn[:, 0]
+    C = m["sxx"] / nn[:, :, None] - mu[:, :, None] * mu[:, None, :]  # population covariance
+    cxy = m["sxy"] / nn - mu * ybar[:, None]
+    var = np.clip(np.diagonal(C, axis1=1, axis2=2), 0, None)
+    eps = np.finfo(np.float64).eps
+    const = var <= nn * eps * var + (nn * mu * eps) ** 2  # StandardScaler's near-constant test
+    s = np.where(const, 1.0, np.sqrt(var))
+    beta = _solve(C / (s[:, :, None] * s[:, None, :]), cxy / s)
+    return {"n": n, "mu": mu, "scale": s, "beta": beta, "intercept": ybar}
+
+def predict(model: dict, X, codes):
+    # NaN for groups that had no training rows
+    X = np.asarray(X, dtype=np.float64).reshape(len(codes), -1)
+    c = np.asarray(codes)
+    yhat = model["intercept"][c] + (((X - model["mu"][c]) / model["scale"][c]) * model["beta"][c]).sum(axis=1)
+    return np.where(model["n"][c] > 0, yhat, np.nan)
+
+class ExpandingOLS:
+    # Expanding-window refits: the per-group moments are carried from one origin to the next
+    # and add_arrays() folds in only the rows that entered the window, so each origin costs
+    # O(step) rows instead of the whole prefix. model() is fit(moments(...)) of every row
+    # added so far.
+    def __init__(self, groups):
+        self.groups, self.m = pd.Index(groups), None
+
+    def add_arrays(self, X, y, codes) -> None:
+        # codes index self.groups
+        m = moments(X, y, codes, len(self.groups))
+        self.m = m if self.m is None else add_moments(self.m, m)
+
+    def model(self) -> dict:
+        return fit(self.m)
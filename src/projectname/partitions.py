@@ -0,0 +1,39 @@
+from __future__ import annotations
+import os
+from pathlib import Path
+import pandas as pd
+
+# Hive-style per-ticker datasets: <root>/ticker=XYZ/*.parquet. Scripts stream these one
+# ticker at a time so peak memory is one ticker's rows, not the whole universe.
+
+def list_tickers(root: str | Path) -> list[str]:
+    root = Path(root)
+    if not root.exists():
+        return []
+    return sorted(p.name.split("=", 1)[1] for p in root.iterdir()
+                  if p.is_dir() and p.name.startswith("ticker="))
+
+def read_partition(root: str | Path, ticker: str, columns: list[str] | None = None) -> pd.DataFrame:
+    # All part files of one ticker; repeated notebook writes leave copies behind, so rows are
+    # de-duplicated on date with the newest file (ties: the last by name) winning, the same
+    # rule sqlio's Parquet views apply. The ticker column is added back.
+    files = sorted(Path(root, f"ticker={ticker}").glob("*.parquet"), key=lambda p: (p.stat().st_mtime_ns, p.name))
+    if not files:
+        return pd.DataFrame(columns=["ticker"] + list(columns or []))
+    df = pd.concat([pd.read_parquet(f, columns=columns) for f in files], ignore_index=True)
+    if "date" in df.columns:
+        df = df.drop_duplicates("date", keep="last").sort_values("date").reset_index(drop=True)
+    df.insert(0, "ticker", ticker)
+    return df
+
+def write_partition(df: pd.DataFrame, root: str | Path, ticker: str, compression: str = "zstd") -> Path:
+    # Replace the ticker's directory contents with a single part file (written under a temp
+    # name first, so a crash never leaves a half-written file as the only copy).
+    d = Path(root, f"ticker={ticker}")
+    d.mkdir(parents=True, exist_ok=True)
+    out, tmp = d / "part-0.parquet", d / ".part-0.parquet.tmp"
+    df.drop(columns=["ticker"], errors="ignore").to_parquet(tmp, compression=compression, index=False)
+    for old in d.glob("*.parquet"):
+        old.unlink()
+    os.replace(tmp, out)
+    return out
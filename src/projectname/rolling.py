@@ -0,0 +1,95 @@
+from __future__ import annotations
+import numpy as np, pandas as pd
+
+# Multi-window rolling mean/std/z-score over ticker-sorted contiguous arrays.
+# All windows come from one set of prefix sums per column, so adding a window is O(n)
+# arithmetic with no extra groupby. For numerical stability the data are centered on
+# their segment's first value (shifted-data variance) and the prefix sums carry an exact
+# TwoSum error term (compensated, Kahan-style summation, but vectorized). Shift and prefix
+# sums restart at every segment and only look backwards, so a ticker's values never
+# depend on other tickers or on rows appended later (see build_features_v1 --incremental).
+
+def segments(keys) -> tuple[np.ndarray, np.ndarray]:
+    # keys sorted so each group is contiguous -> (per-row segment start, per-row segment id)
+    codes = pd.factorize(keys)[0]
+    new = np.r_[True, codes[1:] != codes[:-1]] if len(codes) else np.array([], dtype=bool)
+    seg_id = np.cumsum(new) - 1
+    seg_start = np.flatnonzero(new)[seg_id]
+    return seg_start, seg_id
+
+def compensated_cumsum(x: np.ndarray, init=(0.0, 0.0)) -> tuple[np.ndarray, np.ndarray]:
+    # Inclusive prefix sums as (hi, lo) with hi + lo ~ exact; the stored prefix `init`
+    # (default 0) is prepended so sum(x[s:e]) = (hi[e] - hi[s]) + (lo[e] - lo[s]).
+    hi = np.cumsum(np.r_[init[0], np.asarray(x, dtype=np.float64)])
+    a, b, s = hi[:-1], np.asarray(x, dtype=np.float64), hi[1:]
+    bb = s - a
+    err = (a - (s - bb)) + (b - bb)  # TwoSum: exact rounding error of each partial sum
+    lo = np.cumsum(np.r_[init[1], err])
+    return hi, lo
+
+def segment_prefix(x, seg_start, init=(0.0, 0.0)) -> tuple[np.ndarray, np.ndarray]:
+    # Inclusive per-row (hi, lo) prefix sums restarting at each segment; `init` continues
+    # the first segment from a stored prefix.
+    x = np.asarray(x, dtype=np.float64)
+    hi, lo = np.empty_like(x), np.empty_like(x)
+    heads = np.unique(seg_start)
+    for s, e in zip(heads, np.r_[heads[1:], len(x)]):
+        h, l = compensated_cumsum(x[s:e], init)
+        hi[s:e], lo[s:e] = h[1:], l[1:]
+        init = (0.0, 0.0)
+    return hi, lo
+
+def segment_shift(x, seg_start) -> np.ndarray:
+    # Per-row first non-NaN value of the row's segment (0.0 if there is none)
+    x = np.asarray(x, dtype=np.float64)
+    n = len(x)
+    heads = np.unique(seg_start)
+    valid = np.r_[np.flatnonzero(~np.isnan(x)), n]
+    first = valid[np.searchsorted(valid, heads)]
+    ends = np.r_[heads[1:], n]
+    shift = np.where(first < ends, x[np.minimum(first, n - 1)] if n else 0.0, 0.0)
+    return np.repeat(shift, ends - heads)
+
+def window_stats(x, shift, P1, P2, seg_start, windows, rows=None, min_periods=None,
+                 eps=1e-8, dtype="float32") -> dict[str, np.ndarray]:
+    # Trailing-window mean/std/zscore for the rows in `rows` (default all) from the
+    # per-segment prefixes P1, P2 of the centered values and their squares. seg_start may
+    # be negative when the segment began before x[0] (x is then a stored tail + new rows).
+    x = np.asarray(x, dtype=np.float64)
+    j = np.arange(len(x)) if rows is None else np.asarray(rows, dtype=np.int64)
+    seg = np.broadcast_to(np.asarray(seg_start, dtype=np.int64), x.shape)[j]
+    cnt = np.concatenate(([0], np.cumsum(~np.isnan(x), dtype=np.int64)))
+    out = {}
+    for W in windows:
+        start = np.maximum(seg, j - W + 1)
+        head = start == seg  # window opens at the segment start: nothing to subtract
+        b = np.maximum(start - 1, 0)
+        def wsum(P):
+            hi, lo = P
+            return (hi[j] - np.where(head, 0.0, hi[b])) + (lo[j] - np.where(head, 0.0, lo[b]))
+        nobs = (cnt[j + 1] - cnt[start]).astype(np.float64)
+        s1, s2 = wsum(P1), wsum(P2)
+        minp = W if min_periods is None else min_periods
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean_c = s1 / nobs
+            var = np.clip((s2 - s1 * mean_c) / (nobs - 1), 0.0, None)
+        valid = nobs >= max(minp, 1)
+        mean = np.where(valid, mean_c + shift[j], np.nan)
+        std = np.where(valid & (nobs > 1), np.sqrt(var), np.nan)
+        out[f"roll_mean_{W}"] = mean.astype(dtype)
+        out[f"roll_std_{W}"] = std.astype(dtype)
+        out[f"zscore_{W}"] = ((x[j] - mean) / (std + eps)).astype(dtype)
+    return out
+
+def rolling_stats(values, seg_start, windows, min_periods=None, eps=1e-8,
+                  dtype="float32") -> dict[str, np.ndarray]:
+    # Trailing windows that never cross a segment start. NaNs are skipped (a window is
+    # valid once it holds >= min_periods non-NaN values, default W); std uses ddof=1 and
+    # zscore = (x - mean) / (std + eps), matching the pandas rolling formulation.
+    x = np.asarray(values, dtype=np.float64)
+    seg_start = np.asarray(seg_start, dtype=np.int64)
+    shift = segment_shift(x, seg_start)
+    c = np.where(np.isnan(x), 0.0, x - shift)  # centered, NaN -> 0
+    P1, P2 = segment_prefix(c, seg_start), segment_prefix(c * c, seg_start)
+    return window_stats(x, shift, P1, P2, seg_start, windows, min_periods=min_periods,
+                        eps=eps, dtype=dtype)
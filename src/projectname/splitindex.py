@@ -0,0 +1,118 @@
+from __future__ import annotations
+import json, tempfile
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+import numpy as np, pandas as pd
+
+# Rolling-origin evaluation without per-split scans. The frame is sorted once by
+# (ticker, date); every ticker's rows are then contiguous, so the rows of one ticker inside
+# a date window are a slice [lo[k], hi[k]). The offsets for all tickers come from a single
+# searchsorted on a (ticker code, date rank) key, and columns are plain numpy arrays, so a
+# split's train/validation block for a ticker is a view, not a boolean mask + copy.
+
+def make_splits(dates, train_min, val_size, step, embargo):
+    # expanding train windows from the first date, then an embargo gap and a validation window
+    u = np.array(sorted(pd.to_datetime(pd.Series(dates).unique())))
+    splits=[]; i=train_min-1; n=len(u)
+    while True:
+        if i>=n: break
+        a,b = u[0], u[i]; vs=i+embargo+1; ve=vs+val_size-1
+        if ve>=n: break
+        splits.append((a,b,u[vs],u[ve])); i+=step
+    return splits
+
+class SplitIndex:
+    def __init__(self, df: pd.DataFrame, key: str = "ticker", date: str = "date"):
+        self.df = df.sort_values([key, date], kind="stable").reset_index(drop=True)
+        codes, self.tickers = pd.factorize(self.df[key], sort=True)
+        self.codes = codes.astype(np.int64)
+        d = self.df[date].to_numpy()
+        self.dates = np.unique(d)
+        self._span = len(self.dates) + 1
+        self._key = self.codes * self._span + np.searchsorted(self.dates, d)  # sorted, strictly by (code, date)
+        self._k = np.arange(len(self.tickers), dtype=np.int64) * self._span
+        self._cols = {}
+
+    def __len__(self):
+        return len(self.codes)
+
+    def col(self, name: str) -> np.ndarray:
+        if name not in self._cols:
+            self._cols[name] = self.df[name].to_numpy()
+        return self._cols[name]
+
+    def share(self, root, arrays: dict) -> None:
+        # write the index and the given numeric arrays as .npy files for attach()
+        root = Path(root)
+        for name, a in {"_codes": self.codes, "_key": self._key, "_dates": self.dates, **arrays}.items():
+            np.save(root / f"{name}.npy", np.ascontiguousarray(a), allow_pickle=False)
+        (root / "tickers.json").write_text(json.dumps([str(t) for t in self.tickers]))
+
+    @classmethod
+    def attach(cls, root) -> "SplitIndex":
+        # read-only index over the memory-mapped files written by share(); no DataFrame, only
+        # the shared arrays are available through col()
+        root, ix = Path(root), cls.__new__(cls)
+        load = lambda name: np.load(root / f"{name}.npy", mmap_mode="r")
+        ix.df, ix.tickers = None, pd.Index(json.loads((root / "tickers.json").read_text()))
+        ix.codes, ix._key, ix.dates = load("_codes"), load("_key"), load("_dates")
+        ix._span = len(ix.dates) + 1
+        ix._k = np.arange(len(ix.tickers), dtype=np.int64) * ix._span
+        ix._cols = {p.stem: load(p.stem) for p in root.glob("*.npy") if not p.stem.startswith("_")}
+        return ix
+
+    def add_cols(self, arrays: dict) -> None:
+        # extra row-aligned arrays (e.g. a feature matrix) served by col()
+        self._cols.update(arrays)
+
+    def values(self, names, dtype=np.float64) -> np.ndarray:
+        return self.df[list(names)].to_numpy(dtype=dtype)
+
+    def _rank(self, x, side):
+        if self.dates.dtype.kind == "M":
+            x = pd.Timestamp(x).to_datetime64().astype(self.dates.dtype)
+        return np.searchsorted(self.dates, x, side)
+
+    def bounds(self, start, end):
+        # per-ticker row offsets (lo, hi) of start <= date <= end
+        return (np.searchsorted(self._key, self._k + self._rank(start, "left")),
+                np.searchsorted(self._key, self._k + self._rank(end, "right")))
+
+    @staticmethod
+    def take(lo, hi) -> np.ndarray:
+        # row positions of all the slices [lo[k], hi[k]), ticker by ticker
+        n = hi - lo
+        return np.arange(n.sum()) + np.repeat(lo - np.r_[0, np.cumsum(n)[:-1]], n)
+
+def expanding_blocks(ix: SplitIndex, splits):
+    # Row positions each expanding train window adds to the previous split's: every window of
+    # make_splits starts at the first date, so only rows after the last origin are new. A fit
+    # carried across splits (ols.ExpandingOLS) folds in just these rows.
+    prev_hi = None
+    for a, b, _, _ in splits:
+        lo, hi = ix.bounds(a, b)
+        if prev_hi is not None:
+            lo = prev_hi
+        yield ix.take(lo, hi)
+        prev_hi = hi
+
+_shared = None
+
+def _attach(root):
+    global _shared
+    _shared = SplitIndex.attach(root)
+
+def _call(fn, item):
+    return fn(_shared, *item)
+
+def map_splits(fn, items, ix: SplitIndex, arrays: dict, jobs: int = 1) -> list:
+    # [fn(ix, *item) for item in items], in order. With jobs > 1 the items run in worker
+    # processes that memory-map the index and `arrays` (written once to a temp dir) instead
+    # of unpickling a DataFrame each; fn reads its columns through ix.col(name).
+    ix.add_cols(arrays)
+    if jobs <= 1 or len(items) <= 1:
+        return [fn(ix, *item) for item in items]
+    with tempfile.TemporaryDirectory(prefix="splitindex-") as tmp:
+        ix.share(tmp, arrays)
+        with ProcessPoolExecutor(max_workers=jobs, initializer=_attach, initargs=(tmp,)) as ex:
+            return list(ex.map(_call, [fn] * len(items), items))
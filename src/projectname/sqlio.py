@@ -1,10 +1,13 @@
 from __future__ import annotations
-import sqlite3
-import pandas as pd
+import os, sqlite3, threading, weakref
+import numpy as np, pandas as pd
 from contextlib import contextmanager
 from pathlib import Path
 
 DB_PATH = Path("data/prices.db")
+PARQUET_ROOT = Path("data/processed")
+BACKENDS = ("sqlite", "parquet")
+CACHED_STATEMENTS = 256  # prepared statements kept per connection (sqlite3 default is 128)
 
 @contextmanager
 def connect(db_path: str | Path = DB_PATH):
@@ -15,20 +18,198 @@ def connect(db_path: str | Path = DB_PATH):
     finally:
         con.close()
 
-def query_df(sql: str, params: tuple | list | None = None, db_path: str | Path = DB_PATH) -> pd.DataFrame:
-    with connect(db_path) as con:
-        return pd.read_sql_query(sql, con, params=params)
+# --- pooled read-only connections -------------------------------------------------
+# One connection per (thread, db file), opened lazily with mode=ro and reused for every
+# query on that thread, so repeated small queries skip connect/PRAGMA/statement prepare.
+# A thread's connections live in its threading.local and are closed when that storage is
+# freed (the thread exits) or at interpreter exit, so worker threads that come and go do
+# not leave handles behind.
+_local = threading.local()
+_live = weakref.WeakSet()  # every live thread's _Conns, for close_pool()
+
+def _close_all(conns: dict) -> None:
+    while conns:
+        conns.popitem()[1].close()
+
+class _Conns:
+    def __init__(self):
+        self.open = {}
+        weakref.finalize(self, _close_all, self.open)
+        _live.add(self)
+
+def _thread_conns() -> dict:
+    conns = getattr(_local, "conns", None)
+    if conns is None:
+        conns = _local.conns = _Conns()
+    return conns.open
+
+def read_connection(db_path: str | Path = DB_PATH) -> sqlite3.Connection:
+    path = Path(db_path).resolve()
+    conns = _thread_conns()
+    con = conns.get(path)
+    if con is None:
+        con = conns[path] = sqlite3.connect(f"{path.as_uri()}?mode=ro", uri=True,
+                                            cached_statements=CACHED_STATEMENTS,
+                                            check_same_thread=False)  # closed by the finalizer/close_pool()
+    return con
+
+def close_pool() -> None:
+    # close every thread's connections now; each thread reopens on its next query
+    for conns in list(_live):
+        _close_all(conns.open)
+
+# --- Parquet backend (DuckDB, in-process, columnar) ----------------------------------
+# Exposes the Hive-partitioned datasets under PARQUET_ROOT as the same `prices`/`meta`
+# relations the SQLite schema has (all columns), so sql/*.sql runs unchanged. Part files
+# are de-duplicated as partitions.read_partition does: per (ticker, date) the row from the
+# newest file wins. Filters on date skip row groups via Parquet min/max stats.
+def _newest(dataset: str, key: list, cols: list) -> str:
+    # one row per key: each column's value from the newest (mtime, file name, row) it has
+    vals = ", ".join(f"arg_max_null({c}, _k) AS {c}" for c in cols)  # NULLs win too, like drop_duplicates
+    return f"""
+        SELECT {", ".join(key)}, {vals}
+        FROM (SELECT d.*, (m.mtime, d.filename, d.file_row_number) AS _k
+              FROM read_parquet('{{root}}/{dataset}/*/*.parquet', hive_partitioning = true,
+                                filename = true, file_row_number = true) d
+              JOIN (SELECT file, file_mtime(file) AS mtime FROM glob('{{root}}/{dataset}/*/*.parquet')) m
+                ON d.filename = m.file)
+        GROUP BY {", ".join(key)}
+    """
+
+PARQUET_VIEWS = {
+    "prices": f"""
+        SELECT r.ticker, r.date, p.adj_close, p.volume, r.log_return
+        FROM ({_newest("returns_by_ticker", ["ticker", "date"], ["log_return"])}) r
+        LEFT JOIN ({_newest("prices_by_ticker", ["ticker", "date"], ["adj_close", "volume"])}) p
+          ON p.ticker = r.ticker AND p.date = r.date
+    """,
+    # name/sector from the last row of the newest file
+    "meta": f"""
+        SELECT ticker, name, CAST(sector AS VARCHAR) AS sector
+        FROM ({_newest("prices_by_ticker", ["ticker"], ["name", "sector"])})
+    """,
+}
+
+def parquet_connection(root: str | Path = PARQUET_ROOT):
+    try:
+        import duckdb
+    except ImportError as e:
+        raise SystemExit("The parquet backend needs duckdb: pip install duckdb") from e
+    root = Path(root).resolve()
+    conns = _thread_conns()
+    key = ("parquet", root)
+    con = conns.get(key)
+    if con is None:
+        con = conns[key] = duckdb.connect()  # in-memory catalog; data stays in the Parquet files
+        con.create_function("file_mtime", lambda p: os.stat(p).st_mtime_ns, ["VARCHAR"], "BIGINT", side_effects=True)
+        for name, body in PARQUET_VIEWS.items():
+            con.execute(f"CREATE VIEW {name} AS {body.format(root=root.as_posix())}")
+    return con
+
+def query_df(sql: str, params: tuple | list | None = None, db_path: str | Path = DB_PATH,
+             backend: str = "sqlite", parquet_root: str | Path = PARQUET_ROOT) -> pd.DataFrame:
+    if backend == "sqlite":
+        return pd.read_sql_query(sql, read_connection(db_path), params=params)
+    if backend == "parquet":
+        return parquet_connection(parquet_root).execute(sql, list(params or [])).df()
+    raise ValueError(f"unknown backend {backend!r}; expected one of {BACKENDS}")
+
+# --- daily sector aggregates ---------------------------------------------------------
+# sector_daily holds one row of sufficient statistics per (sector, day); range summaries
+# then sum days x sectors rows instead of rescanning prices JOIN meta.
+SECTOR_DAILY_DDL = """
+CREATE TABLE IF NOT EXISTS sector_daily (
+  sector  TEXT NOT NULL,
+  date    TEXT NOT NULL,
+  n       INTEGER NOT NULL,
+  sum     REAL NOT NULL,
+  sumsq   REAL NOT NULL,
+  sum_abs REAL NOT NULL,
+  max_abs REAL NOT NULL,
+  PRIMARY KEY (date, sector)
+);
+"""
+
+def refresh_sector_daily(con: sqlite3.Connection, start: str, end: str) -> None:
+    # Recompute the aggregates for days in [start, end] only, e.g. the days just upserted.
+    # Call inside the writer's transaction; cost scales with the touched days. The first
+    # refresh of a DB built before sector_daily existed backfills every day in prices, so
+    # the table never covers only the latest upsert.
+    new = con.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name='sector_daily'").fetchone() is None
+    con.execute(SECTOR_DAILY_DDL)
+    if new:
+        start, end = con.execute("SELECT MIN(date), MAX(date) FROM prices").fetchone()
+    con.execute("DELETE FROM sector_daily WHERE date BETWEEN ? AND ?", (start, end))
+    con.execute("""
+        INSERT INTO sector_daily(sector,date,n,sum,sumsq,sum_abs,max_abs)
+        SELECT m.sector, p.date, COUNT(*), SUM(p.log_return), SUM(p.log_return*p.log_return),
+               SUM(ABS(p.log_return)), MAX(ABS(p.log_return))
+        FROM prices p JOIN meta m ON p.ticker = m.ticker
+        WHERE p.date BETWEEN ? AND ?
+        GROUP BY m.sector, p.date
+    """, (start, end))
+
+def has_table(name: str, db_path: str | Path = DB_PATH) -> bool:
+    row = read_connection(db_path).execute(
+        "SELECT 1 FROM sqlite_master WHERE type='table' AND name=?", (name,)).fetchone()
+    return row is not None
 
 def sector_summary(start: str, end: str, db_path: str | Path = DB_PATH) -> pd.DataFrame:
-    sql = '''
-    SELECT m.sector, p.log_return
+    # Aggregate in SQLite: one row of sufficient statistics per sector comes back,
+    # so memory is O(sectors) no matter how many price rows the range covers.
+    if has_table("sector_daily", db_path):
+        sql = '''
+        SELECT sector, SUM(n) AS n, SUM(sum) AS s, SUM(sumsq) AS ss, SUM(sum_abs) AS sa
+        FROM sector_daily
+        WHERE date BETWEEN ? AND ?
+        GROUP BY sector
+        ORDER BY sector;
+        '''
+    else:  # database built before sector_daily existed
+        sql = '''
+        SELECT m.sector,
+               COUNT(p.log_return)                  AS n,
+               SUM(p.log_return)                    AS s,
+               SUM(p.log_return * p.log_return)     AS ss,
+               SUM(ABS(p.log_return))               AS sa
+        FROM prices p JOIN meta m ON p.ticker = m.ticker
+        WHERE p.date BETWEEN ? AND ?
+        GROUP BY m.sector
+        ORDER BY m.sector;
+        '''
+    agg = query_df(sql, [start, end], db_path)
+    return summarize_moments(agg)
+
+def top_moves(k: int = 10, start: str | None = None, end: str | None = None,
+              sector: str | None = None, db_path: str | Path = DB_PATH) -> pd.DataFrame:
+    # Largest |log_return| rows; ORDER BY matches idx_prices_abs_return, so SQLite walks the
+    # index from the top and stops after k qualifying rows instead of sorting the table.
+    where, params = [], []
+    if start is not None:
+        where.append("p.date >= ?"); params.append(start)
+    if end is not None:
+        where.append("p.date <= ?"); params.append(end)
+    if sector is not None:
+        where.append("m.sector = ?"); params.append(sector)
+    sql = f'''
+    SELECT m.sector, p.ticker, p.date, p.log_return, ABS(p.log_return) AS abs_move
     FROM prices p JOIN meta m ON p.ticker = m.ticker
-    WHERE p.date BETWEEN ? AND ?;
+    {"WHERE " + " AND ".join(where) if where else ""}
+    ORDER BY ABS(p.log_return) DESC
+    LIMIT ?;
     '''
-    df = query_df(sql, [start, end], db_path)
-    if df.empty:
-        return df
-    g = df.assign(abs=lambda d: d["log_return"].abs()).groupby("sector")
-    return g.agg(mean_abs_return=("abs","mean"),
-                 mean_return=("log_return","mean"),
-                 std_return=("log_return","std")).reset_index()
+    return query_df(sql, params + [int(k)], db_path)
+
+def summarize_moments(agg: pd.DataFrame) -> pd.DataFrame:
+    # (n, sum, sum of squares, sum of abs) per sector -> mean_abs / mean / sample std (ddof=1)
+    cols = ["sector","mean_abs_return","mean_return","std_return"]
+    agg = agg[agg["n"] > 0]
+    if agg.empty:
+        return pd.DataFrame(columns=cols)
+    n = agg["n"].astype("float64")
+    mean = agg["s"] / n
+    var = (agg["ss"] - n * mean * mean) / (n - 1).where(n > 1)
+    return pd.DataFrame({"sector": agg["sector"].to_numpy(),
+                         "mean_abs_return": (agg["sa"] / n).to_numpy(),
+                         "mean_return": mean.to_numpy(),
+                         "std_return": np.sqrt(var.clip(lower=0)).to_numpy()})
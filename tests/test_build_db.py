@@ -0,0 +1,52 @@
+# tests/test_build_db.py
+import sqlite3
+import numpy as np, pandas as pd
+import pytest
+
+from scripts.build_db import DDL, bulk_load_prices, load_meta, load_prices, main
+
+@pytest.fixture()
+def inputs(tmp_path):
+    rng = np.random.default_rng(1)
+    tks = ["AAA", "BBB", "CCC"]
+    dates = pd.bdate_range("2024-01-01", periods=40).strftime("%Y-%m-%d")
+    df = pd.DataFrame([(t, d, float(rng.uniform(50, 150)), int(rng.integers(1e3, 1e6)), float(rng.normal(0, 0.02)))
+                       for t in tks for d in dates], columns=["ticker", "date", "adj_close", "volume", "log_return"])
+    dup = df.sample(15, random_state=0).assign(adj_close=-1.0)  # later duplicates lose (first occurrence wins)
+    pd.concat([df, dup], ignore_index=True).to_csv(tmp_path / "prices.csv", index=False)
+    pd.DataFrame({"ticker": tks}).to_csv(tmp_path / "tickers.csv", index=False)
+    return tmp_path, df
+
+def _build(tmp_path, name, load):
+    con = sqlite3.connect(tmp_path / name)
+    con.executescript(DDL)
+    load_meta(con, tmp_path / "tickers.csv")
+    load(con, tmp_path / "prices.csv", chunk_rows=17)
+    return con
+
+def _dump(con, table):
+    return con.execute(f"SELECT * FROM {table} ORDER BY 1, 2, 3").fetchall()
+
+def test_bulk_load_builds_the_same_db(inputs):
+    tmp_path, df = inputs
+    ref, bulk = _build(tmp_path, "ref.db", load_prices), _build(tmp_path, "bulk.db", bulk_load_prices)
+    assert _dump(bulk, "prices") == _dump(ref, "prices")
+    assert _dump(bulk, "sector_daily") == _dump(ref, "sector_daily")
+    assert bulk.execute("SELECT MIN(adj_close) FROM prices").fetchone()[0] >= 50
+    # staging and pragmas do not outlive the load
+    assert bulk.execute("PRAGMA journal_mode").fetchone()[0] == ref.execute("PRAGMA journal_mode").fetchone()[0] == "delete"
+    tables = lambda con: sorted(r[0] for r in con.execute("SELECT name FROM sqlite_master WHERE type IN ('table','index')"))
+    assert tables(bulk) == tables(ref)
+
+def test_chunked_ingest_counts_and_indexes(inputs, monkeypatch):
+    tmp_path, df = inputs
+    monkeypatch.setattr("sys.argv", ["build_db.py", "--db", str(tmp_path / "p.db"), "--tickers", str(tmp_path / "tickers.csv"),
+                                     "--prices", str(tmp_path / "prices.csv"), "--chunk-rows", "7"])
+    main()
+    con = sqlite3.connect(tmp_path / "p.db")
+    assert con.execute("SELECT COUNT(*) FROM prices").fetchone()[0] == len(df) == 120
+    assert con.execute("SELECT COUNT(*) FROM meta").fetchone()[0] == 3
+    assert con.execute("SELECT COUNT(*), SUM(n) FROM sector_daily").fetchone() == (120, 120)
+    assert con.execute("SELECT MIN(adj_close) FROM prices").fetchone()[0] >= 50  # dedup across chunk boundaries
+    idx = {r[1] for r in con.execute("PRAGMA index_list(prices)")}
+    assert {"idx_prices_date", "idx_prices_abs_return"} <= idx
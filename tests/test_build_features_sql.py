@@ -0,0 +1,61 @@
+# tests/test_build_features_sql.py
+import math, sqlite3
+import numpy as np, pandas as pd
+import pytest
+
+from scripts.build_db import DDL
+from scripts.build_features_sql import SCHEMAS, head_mask, sqlite_batches, write_features
+
+@pytest.fixture()
+def con(tmp_path):
+    rng = np.random.default_rng(0)
+    dates = pd.bdate_range("2024-01-01", periods=50).strftime("%Y-%m-%d")
+    con = sqlite3.connect(tmp_path / "prices.db")
+    con.executescript(DDL)
+    rows = [(t, d, 100.0, 1000, float(rng.normal(0, 0.02)))
+            for t, n in [("AAA", 50), ("BBB", 2), ("CCC", 30)] for d in dates[:n]]
+    rows += [("DDD", d, 100.0, 1000, 0.01) for d in dates[:25]]  # flat returns: std ~0
+    con.executemany("INSERT INTO meta VALUES(?,?,?)", [(t, t, "Tech") for t in ["AAA","BBB","CCC","DDD"]])
+    con.executemany("INSERT INTO prices VALUES(?,?,?,?,?)", rows)
+    con.create_function("SQRT", 1, lambda x: math.sqrt(x) if x is not None and x >= 0 else None)
+    yield con
+    con.close()
+
+def _reference(con, sql, params, drop_head, path):
+    # the pre-streaming pandas implementation, as read back from the file it wrote
+    df = pd.read_sql_query(sql, con, params=params)
+    df["roll_std_20"] = (df["roll_var_20"].clip(lower=0)).pow(0.5)
+    df["zscore_20"] = (df["r_1d"] - df["roll_mean_20"]) / df["roll_std_20"].replace(0, pd.NA)
+    df = (df.sort_values(["ticker","date"]).groupby("ticker", group_keys=False)
+            .apply(lambda g: g.iloc[drop_head:]))
+    df.to_parquet(path, index=False)
+    return pd.read_parquet(path)
+
+@pytest.mark.parametrize("batch_rows", [1, 7, 100_000])
+def test_streamed_matches_pandas_path(con, tmp_path, batch_rows):
+    sql, params = open("sql/features_window.sql").read(), ["2024-01-01", "2024-12-31"]
+    out = tmp_path / "f.parquet"
+    rows = write_features(sqlite_batches(con, sql, params, batch_rows, SCHEMAS["features_window.sql"]), out, drop_head=3)
+    got, ref = pd.read_parquet(out), _reference(con, sql, params, 3, tmp_path / "ref.parquet")
+    assert rows == len(ref) == 47 + 27 + 22
+    pd.testing.assert_frame_equal(got, ref, check_exact=True)
+    assert not np.isinf(got["zscore_20"]).any()
+
+def test_head_mask_needs_ticker_order():
+    import pyarrow as pa
+    state = {"seen": set()}
+    assert head_mask(pa.array(["A","A","B"]), state, 1).tolist() == [False, True, False]
+    assert head_mask(pa.array(["B","C"]), state, 1).tolist() == [True, False]
+    with pytest.raises(SystemExit):
+        head_mask(pa.array(["C","A"]), state, 1)
+
+def test_batches_keep_declared_types(con):
+    # a batch of NULL lags must not change the schema: with batch_rows=1 the first rows have
+    # NULL lag1..3, which inference cannot type but the declared schema can
+    sql, params = open("sql/features_window.sql").read(), ["2024-01-01", "2024-12-31"]
+    batches = list(sqlite_batches(con, sql, params, 1, SCHEMAS["features_window.sql"]))
+    assert len({b.schema for b in batches}) == 1 and batches[0].schema.field("lag1").type == "double"
+    with pytest.raises(SystemExit):
+        next(sqlite_batches(con, sql, params, 1))
+    b = next(sqlite_batches(con, "SELECT ticker, volume, adj_close FROM prices ORDER BY ticker, date", []))
+    assert [f.type for f in b.schema] == ["string", "int64", "double"]
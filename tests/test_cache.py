@@ -0,0 +1,49 @@
+# tests/test_cache.py
+import importlib, os, re
+from pathlib import Path
+import pytest
+from src.projectname.cache import cached_stage, evict
+
+def _stage(tmp_path, calls, **kw):
+    src, out = tmp_path / "in.txt", tmp_path / "out.txt"
+    def run():
+        calls.append(1)
+        out.write_text(src.read_text().upper())
+    return cached_stage("upper", [src], [out], run, cache_dir=tmp_path / "cache", **kw)
+
+def test_hit_skips_run_and_restores_output(tmp_path):
+    calls = []
+    (tmp_path / "in.txt").write_text("abc")
+    assert _stage(tmp_path, calls) is False
+    (tmp_path / "out.txt").unlink()
+    assert _stage(tmp_path, calls) is True
+    assert len(calls) == 1 and (tmp_path / "out.txt").read_text() == "ABC"
+
+def test_input_content_or_params_change_misses(tmp_path):
+    calls = []
+    (tmp_path / "in.txt").write_text("abc")
+    _stage(tmp_path, calls)
+    os.utime(tmp_path / "in.txt", (0, 0))  # touched but same bytes: still a hit
+    assert _stage(tmp_path, calls) is True
+    (tmp_path / "in.txt").write_text("abd")
+    assert _stage(tmp_path, calls) is False
+    assert _stage(tmp_path, calls, params={"k": 1}) is False
+    assert len(calls) == 3 and (tmp_path / "out.txt").read_text() == "ABD"
+
+def test_evict_drops_least_recently_used(tmp_path):
+    cache = tmp_path / "cache"
+    for i, name in enumerate(["a", "b", "c"]):
+        d = cache / name; d.mkdir(parents=True)
+        (d / "0").write_bytes(b"x" * 100)
+        os.utime(d, (i, i))
+    os.utime(cache / "a", (10, 10))  # "a" was just hit
+    assert evict(cache, max_bytes=200) == ["b"]
+    assert sorted(p.name for p in cache.iterdir()) == ["a", "c"]
+
+@pytest.mark.parametrize("script", ["build_features_v1", "eval_linlags", "make_multistep_labels"])
+def test_stage_sources_cover_imported_modules(script):
+    # a cached stage must be keyed on every src/projectname module its output depends on
+    mod = importlib.import_module(f"scripts.{script}")
+    text = Path(mod.__file__).read_text()
+    imported = {f"{m}.py" for m in re.findall(r"^from src\.projectname\.(\w+) import", text, re.M)} - {"cache.py"}
+    assert imported and imported <= {Path(p).name for p in mod.SOURCES}
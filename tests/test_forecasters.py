@@ -0,0 +1,49 @@
+# tests/test_forecasters.py
+import argparse
+import numpy as np, pandas as pd, pytest
+
+from scripts.baselines_eval import add_preds, split_metrics
+from scripts.eval_models import evaluate
+from src.projectname.forecasters import REGISTRY, make
+from src.projectname.ols import fit, moments, predict
+from src.projectname.splitindex import SplitIndex, make_splits
+
+def _features(path):
+    rng = np.random.default_rng(11)
+    parts = []
+    for t, n in [("AAA", 120), ("BBB", 110), ("CCC", 90)]:
+        lr = rng.normal(0, 0.02, n)
+        parts.append(pd.DataFrame({"ticker": t, "date": pd.bdate_range("2024-01-01", periods=n), "log_return": lr,
+                                   "r_1d": np.r_[lr[1:], np.nan], **{f"lag{i}": pd.Series(lr).shift(i) for i in (1, 2, 3)}}))
+    df = pd.concat(parts, ignore_index=True)
+    df.to_parquet(path)
+    return df
+
+def test_registry_and_make():
+    assert {"naive", "snaive", "lin_lags"} <= set(REGISTRY)
+    assert make("snaive", seasonality=3, xcols=["lag1"]).needs == ("yhat_s3",)
+    with pytest.raises(ValueError):
+        make("prophet")
+
+def test_harness_matches_baselines_and_linlags(tmp_path):
+    df = _features(tmp_path / "f.parquet")
+    args = argparse.Namespace(features=str(tmp_path / "f.parquet"), models=["naive", "snaive", "lin_lags"], seasonality=5,
+                              xcols=["lag1", "lag2", "lag3"], train_min=40, val_size=15, step=15, embargo=2, jobs=1,
+                              out_summary=str(tmp_path / "s.csv"), out_per_ticker=str(tmp_path / "pt{sid}.csv"))
+    summ = evaluate(args)
+    assert len(summ) and list(summ["model"].unique()) == args.models
+    ix = SplitIndex(add_preds(df, 5))
+    for sid, (a, b, c, d) in enumerate(make_splits(ix.dates, 40, 15, 15, 2), start=1):
+        pt = pd.read_csv(tmp_path / f"pt{sid}.csv")
+        ref = split_metrics(ix, ix.bounds(c, d), ix.bounds(a, b), 5)
+        for model, method, cols in [("naive", "naive", ["mae", "smape", "mase"]), ("snaive", "s", ["mae", "smape"])]:
+            got = pt[pt["model"] == model].reset_index(drop=True)
+            exp = ref[ref["method"] == method].reset_index(drop=True)
+            assert list(got["ticker"]) == list(exp["ticker"].astype(str))
+            np.testing.assert_allclose(got[cols], exp[cols], rtol=1e-12)
+        tr, va = ix.df[(ix.df["date"] >= a) & (ix.df["date"] <= b)], ix.df[(ix.df["date"] >= c) & (ix.df["date"] <= d)]
+        model = fit(moments(tr[args.xcols].to_numpy(), tr["r_1d"].to_numpy(), ix.codes[tr.index], len(ix.tickers)))
+        yhat = predict(model, va[args.xcols].to_numpy(), ix.codes[va.index])
+        got = pt[pt["model"] == "lin_lags"].set_index("ticker")
+        for t, g in pd.DataFrame({"t": va["ticker"].to_numpy(), "e": np.abs(va["r_1d"].to_numpy() - yhat)}).dropna().groupby("t"):
+            assert np.isclose(got.loc[t, "mae"], g["e"].mean(), rtol=1e-12)
@@ -0,0 +1,71 @@
+# tests/test_get_prices.py
+import random, time
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np, pandas as pd
+
+import scripts.get_prices as gp
+
+def _bars(ticker, start, end):
+    idx = pd.bdate_range(start, end)
+    return pd.DataFrame({"ticker": ticker, "date": idx, "close": 100.0 + idx.day, "volume": 1000})
+
+def test_rate_limiter_spaces_calls_across_threads():
+    lim, starts = gp.RateLimiter(50.0), []
+    with ThreadPoolExecutor(max_workers=4) as ex:
+        list(ex.map(lambda _: (lim.wait(), starts.append(time.monotonic())), range(8)))
+    gaps = [b - a for a, b in zip(sorted(starts), sorted(starts)[1:])]
+    assert min(gaps) >= 0.015 and sorted(starts)[-1] - sorted(starts)[0] >= 7 * 0.019
+    t0 = time.monotonic(); gp.RateLimiter(0).wait(); assert time.monotonic() - t0 < 0.01  # 0 = unlimited
+
+def test_fetch_all_keeps_input_order_and_status(monkeypatch):
+    def fake(ticker, start, end):
+        time.sleep(random.random() * 0.02)
+        if ticker == "BAD":
+            raise ValueError("boom")
+        return _bars(ticker, start, end)
+    monkeypatch.setattr(gp, "fetch_yf", fake)
+    tickers = ["ZZZ", "BAD", "AAA", "MMM", "BBB"]
+    frames, status = gp.fetch_all(tickers, "2024-01-01", "2024-01-31", workers=4)
+    assert [f["ticker"].iloc[0] for f in frames] == tickers
+    assert list(status["ticker"]) == tickers
+    assert list(status["source"]) == ["yfinance", "synthetic", "yfinance", "yfinance", "yfinance"]
+    assert status.loc[1, "error"] == "ValueError: boom" and (status["rows"] == 23).all()
+    serial, _ = gp.fetch_all(tickers, "2024-01-01", "2024-01-31", workers=1)
+    for a, b in zip(frames, serial):
+        pd.testing.assert_frame_equal(a, b)
+
+def test_incremental_never_writes_synthetic_bars(tmp_path, monkeypatch):
+    (tmp_path / "t.csv").write_text("ticker\nAAA\nBBB\n")
+    old = pd.concat([_bars(t, "2024-01-01", "2024-01-12").rename(columns={"close": "adj_close"}) for t in ["AAA", "BBB"]])
+    old.assign(date=old["date"].dt.date, log_return=0.0).to_csv(tmp_path / "p.csv", index=False)
+    before = (tmp_path / "p.csv").read_text()
+    argv = ["get_prices.py", "--tickers", str(tmp_path / "t.csv"), "--out", str(tmp_path / "p.csv"), "--incremental",
+            "--db", str(tmp_path / "none.db"), "--end", "2024-01-17", "--rate", "0", "--timing-out", str(tmp_path / "s.csv")]
+    monkeypatch.setattr("sys.argv", argv)
+    def no_new_bars(ticker, start, end):
+        raise RuntimeError("empty")
+    monkeypatch.setattr(gp, "fetch_yf", no_new_bars)
+    gp.main()
+    assert (tmp_path / "p.csv").read_text() == before
+    status = pd.read_csv(tmp_path / "s.csv")
+    assert list(status["source"]) == ["failed", "failed"] and (status["rows"] == 0).all()
+    assert (status["error"] == "RuntimeError: empty").all()
+
+    def flaky(ticker, start, end):  # AAA's host errors, BBB has three new bars
+        if ticker == "AAA":
+            raise ConnectionError("timeout")
+        return _bars(ticker, start, end)
+    monkeypatch.setattr(gp, "fetch_yf", flaky)
+    gp.main()
+    new = pd.read_csv(tmp_path / "p.csv").iloc[len(old):]
+    assert list(new["ticker"]) == ["BBB"] * 3 and list(new["date"]) == ["2024-01-15", "2024-01-16", "2024-01-17"]
+    assert abs(new["log_return"].iloc[0] - float(np.log(115.0 / 112.0))) < 1e-12
+    assert list(pd.read_csv(tmp_path / "s.csv")["source"]) == ["failed", "yfinance"]
+
+    (tmp_path / "t.csv").write_text("ticker\nAAA\nBBB\nCCC\n")  # new ticker, no stored history
+    before = (tmp_path / "p.csv").read_text()
+    monkeypatch.setattr(gp, "fetch_yf", no_new_bars)
+    gp.main()
+    assert (tmp_path / "p.csv").read_text() == before
+    status = pd.read_csv(tmp_path / "s.csv")
+    assert list(status["source"]) == ["failed", "up-to-date", "failed"] and status.loc[2, "rows"] == 0
@@ -1,12 +1,32 @@
 # save to tests/test_labels_multistep.py
 import pandas as pd, numpy as np
 
+from scripts.make_multistep_labels import add_multistep
+
 def test_r5d_definition():
     df = pd.read_parquet("data/processed/returns_multistep.parquet").sort_values(["ticker","date"])
     if "r_5d" not in df.columns:
         return
     for tkr, g in df.groupby("ticker"):
-        lr = g["log_return"]
+        lr = g["log_return"].astype("float64")  # labels are float64 sums of the stored returns
         r5 = sum(lr.shift(-h) for h in range(1,6))
         diff = (g["r_5d"] - r5).abs().max()
-        assert float(diff) < 1e-10, f"r_5d misdefined for {tkr} (max |Δ|={diff})"
\ No newline at end of file
+        assert float(diff) < 1e-10, f"r_5d misdefined for {tkr} (max |Δ|={diff})"
+
+def test_label_engine_matches_shift_definition():
+    rng = np.random.default_rng(5)
+    df = pd.concat([pd.DataFrame({"date": pd.bdate_range("2024-01-01", periods=n), "ticker": t,
+                                  "log_return": rng.normal(0, 0.02, n).astype("float32")})
+                    for t, n in [("A", 150), ("B", 4), ("C", 90)]], ignore_index=True)
+    df.loc[[0, 40], "log_return"] = np.nan  # leading NaN (ignored) and a gap (poisons windows)
+    out = add_multistep(df.sample(frac=1, random_state=0), (1, 5, 21), ("sum", "max", "min", "vol"))
+    for tkr, g in out.groupby("ticker"):
+        assert g["log_return"].dtype == "float32"  # the input column is left as is
+        ahead = pd.concat([g["log_return"].astype("float64").shift(-h) for h in range(1, 22)], axis=1)
+        for H in (1, 5, 21):
+            w = ahead.iloc[:, :H]
+            path = w.cumsum(axis=1, skipna=False)
+            ref = {"r": w.sum(axis=1, skipna=False), "rmax": path.max(axis=1, skipna=False),
+                   "rmin": path.min(axis=1, skipna=False), "vol": w.std(axis=1, skipna=False)}
+            for k, v in ref.items():
+                np.testing.assert_allclose(g[f"{k}_{H}d"], v, atol=1e-12, equal_nan=True, err_msg=f"{tkr} {k}_{H}d")
@@ -0,0 +1,34 @@
+# tests/test_metrics.py
+import numpy as np, pandas as pd
+
+from src.projectname.metrics import aggregate, group_mae, mae, mase, per_group, smape, summarize
+
+def test_grouped_metrics_match_scalar_loop():
+    rng = np.random.default_rng(5)
+    n = 600
+    df = pd.DataFrame({"model": rng.choice(["naive", "lin"], n), "ticker": rng.choice(["A", "B", "C", "D"], n),
+                       "y": rng.normal(0, 0.02, n), "yhat": rng.normal(0, 0.02, n)})
+    df.loc[df.index[::37], "yhat"] = np.nan
+    ytr, ntr = rng.normal(0, 0.02, 40), rng.normal(0, 0.02, 40)
+    codes = np.repeat([0, 1, 2, 3], 10)
+    scale = group_mae(codes, ytr, ntr, 4)
+    pt = per_group({"model": df["model"], "ticker": df["ticker"]}, df["y"], df["yhat"],
+                   scale=scale[df["ticker"].map({"A": 0, "B": 1, "C": 2, "D": 3})])
+    assert list(pt["model"]) == ["lin"] * 4 + ["naive"] * 4
+    for row in pt.itertuples():
+        g = df[(df["model"] == row.model) & (df["ticker"] == row.ticker)].dropna()
+        k = "ABCD".index(row.ticker)
+        assert row.n == len(g)
+        assert np.isclose(row.mae, mae(g["y"], g["yhat"]), rtol=1e-12)
+        assert np.isclose(row.smape, smape(g["y"], g["yhat"]), rtol=1e-12)
+        assert np.isclose(row.mase, mase(g["y"], g["yhat"], ytr[codes == k], ntr[codes == k]), rtol=1e-12)
+    summ = summarize(pt, ["model"]).set_index("model")
+    for m, g in pt.groupby("model"):
+        assert np.isclose(summ.loc[m, "macro_smape"], g["smape"].mean(), rtol=1e-12)
+        assert np.isclose(summ.loc[m, "micro_mae"], np.average(g["mae"], weights=g["n"]), rtol=1e-12)
+
+def test_macro_skips_nan_groups_micro_does_not():
+    pt = pd.DataFrame({"ticker": ["A", "B"], "n": [2, 3], "mae": [1.0, 2.0], "smape": [0.5, 0.5], "mase": [np.nan, 1.0]})
+    agg = aggregate(pt)
+    assert agg["macro_mase"] == 1.0 and np.isnan(agg["micro_mase"]) and agg["micro_mae"] == 1.6
+    assert all(np.isnan(v) for v in aggregate(pt.iloc[:0]).values())
@@ -0,0 +1,48 @@
+# tests/test_modelcache.py
+import os
+import numpy as np, pandas as pd
+
+import src.projectname.modelcache as mc
+from src.projectname.ols import fit, moments
+from src.projectname.splitindex import SplitIndex
+
+def _index():
+    rng = np.random.default_rng(9)
+    df = pd.DataFrame({"ticker": np.repeat(["A", "B", "C"], 60), "date": np.tile(pd.bdate_range("2024-01-01", periods=60), 3),
+                       "x1": rng.normal(size=180), "x2": rng.normal(size=180), "y": rng.normal(size=180)})
+    return SplitIndex(df)
+
+def _fit(ix, end, cache_dir, data="d0", **kw):
+    tr = ix.bounds(pd.Timestamp("2024-01-01"), pd.Timestamp(end))
+    return mc.fit_cached(ix, ix.values(["x1", "x2"]), ix.col("y"), tr, data, ("2024-01-01", end), ["x1", "x2"],
+                         cache_dir=cache_dir, **kw)
+
+def test_hit_skips_fitting_and_matches_plain_fit(tmp_path, monkeypatch):
+    ix = _index()
+    X, y = ix.values(["x1", "x2"]), ix.col("y")
+    tp = ix.take(*ix.bounds(pd.Timestamp("2024-01-01"), pd.Timestamp("2024-02-15")))
+    ref = fit(moments(X[tp], y[tp], ix.codes[tp], 3))
+    cold = _fit(ix, "2024-02-15", tmp_path)
+    assert [len(list(d.iterdir())) for d in tmp_path.iterdir()] == [1]  # one array for all tickers
+    seen = []
+    monkeypatch.setattr(mc, "moments", lambda *a: seen.append(1) or moments(*a))
+    warm = _fit(ix, "2024-02-15", tmp_path)
+    assert seen == []
+    for m in (cold, warm):
+        for key in ref:
+            np.testing.assert_array_equal(m[key], ref[key])
+    _fit(ix, "2024-02-15", tmp_path, data="d1")  # features file changed
+    _fit(ix, "2024-02-20", tmp_path)  # another split
+    assert len(seen) == 2 and len(list(tmp_path.iterdir())) == 3
+
+def test_entries_are_evicted_by_cache_evict(tmp_path):
+    ix = _index()
+    _fit(ix, "2024-02-01", tmp_path)
+    first, = tmp_path.iterdir()
+    size = sum(f.stat().st_size for f in first.iterdir())
+    _fit(ix, "2024-02-15", tmp_path)
+    second, = set(tmp_path.iterdir()) - {first}
+    os.utime(first, (0, 0)); os.utime(second, (1, 1))
+    _fit(ix, "2024-02-01", tmp_path)  # hit: bumps the first entry
+    _fit(ix, "2024-02-20", tmp_path, max_bytes=2 * size)
+    assert first.exists() and not second.exists() and len(list(tmp_path.iterdir())) == 2
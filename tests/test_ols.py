@@ -0,0 +1,50 @@
+# tests/test_ols.py
+import numpy as np, pandas as pd
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import StandardScaler
+from sklearn.linear_model import LinearRegression
+
+from src.projectname.ols import ExpandingOLS, fit, moments, predict
+
+def _panel(rng, sizes):
+    rows = []
+    for t, n in sizes.items():
+        x = rng.normal(0.0005, 0.02, (n, 3))
+        rows.append(pd.DataFrame({"ticker": t, "lag1": x[:, 0], "lag2": x[:, 1], "lag3": x[:, 2],
+                                  "r_1d": x @ [0.1, -0.05, 0.02] + rng.normal(0, 0.02, n)}))
+    return pd.concat(rows, ignore_index=True)
+
+def _codes(df, groups):
+    return pd.Index(groups).get_indexer(df["ticker"])
+
+def test_batched_ols_matches_sklearn_per_ticker():
+    rng = np.random.default_rng(0)
+    tr = _panel(rng, {"AAA": 300, "BBB": 40, "CCC": 2, "DDD": 120}).sample(frac=1, random_state=1)
+    tr.loc[tr["ticker"] == "DDD", "lag3"] = 0.01  # constant feature
+    va = _panel(rng, {"AAA": 20, "CCC": 5, "DDD": 7, "EEE": 3})
+    groups, xcols = ["AAA","BBB","CCC","DDD","EEE"], ["lag1","lag2","lag3"]  # EEE: no training rows
+    model = fit(moments(tr[xcols].to_numpy(), tr["r_1d"].to_numpy(), _codes(tr, groups), len(groups)))
+    yhat = predict(model, va[xcols].to_numpy(), _codes(va, groups))
+    assert np.isnan(yhat[(va["ticker"] == "EEE").to_numpy()]).all()
+    for t, g in va[va["ticker"] != "EEE"].groupby("ticker"):
+        trk = tr[tr["ticker"] == t]
+        pipe = Pipeline([("scaler", StandardScaler()), ("lr", LinearRegression())])
+        pipe.fit(trk[xcols].values, trk["r_1d"].values)
+        ref = pipe.predict(g[xcols].values)
+        assert np.allclose(yhat[(va["ticker"] == t).to_numpy()], ref, rtol=0, atol=1e-10)
+
+def test_expanding_fit_equals_refit_on_prefix():
+    rng = np.random.default_rng(2)
+    df = _panel(rng, {"AAA": 90, "BBB": 90, "CCC": 90})
+    df["date"] = np.tile(np.arange(90), 3)
+    df.loc[df.index[::17], "lag2"] = np.nan  # skipped by both
+    groups, xcols = ["AAA","BBB","CCC"], ["lag1","lag2","lag3"]
+    lin = ExpandingOLS(groups)
+    for lo, hi in [(0, 20), (20, 35), (35, 36), (36, 70)]:
+        new = df[(df["date"] >= lo) & (df["date"] < hi)]
+        lin.add_arrays(new[xcols].to_numpy(), new["r_1d"].to_numpy(), _codes(new, groups))
+        pre = df[df["date"] < hi]
+        ref = fit(moments(pre[xcols].to_numpy(), pre["r_1d"].to_numpy(), _codes(pre, groups), 3))
+        got = lin.model()
+        for key in ref:
+            assert np.allclose(got[key], ref[key], rtol=0, atol=1e-13)
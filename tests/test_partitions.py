@@ -0,0 +1,70 @@
+# tests/test_partitions.py
+import os
+import numpy as np, pandas as pd
+import pytest
+
+from src.projectname.partitions import list_tickers, read_partition, write_partition
+from scripts.build_features_v1 import build_by_ticker, build_features, select_keep
+from scripts.make_multistep_labels import add_multistep, make_multistep_by_ticker
+
+@pytest.fixture()
+def src(tmp_path):
+    rng = np.random.default_rng(4)
+    for t, n in [("AAA", 80), ("BBB", 30), ("CCC", 120)]:
+        dates = pd.bdate_range("2024-01-01", periods=n)
+        lr = rng.normal(0, 0.02, n).astype("float32")
+        r = pd.DataFrame({"date": dates, "log_return": lr, "r_1d": np.r_[lr[1:], np.nan].astype("float32"),
+                          "weekday": dates.weekday.astype("int8"), "month": dates.month.astype("int8")})
+        p = pd.DataFrame({"date": dates, "adj_close": (100 * np.exp(np.cumsum(lr))).astype("float32"),
+                          "volume": 1000})
+        for name, df in [("returns_by_ticker", r), ("prices_by_ticker", p)]:
+            d = tmp_path / name / f"ticker={t}"; d.mkdir(parents=True)
+            df.to_parquet(d / "a-0.parquet", index=False)
+        stale = p.head(5).assign(adj_close=np.float32(-1.0))  # older duplicate file
+        stale.to_parquet(tmp_path / "prices_by_ticker" / f"ticker={t}" / "b-0.parquet", index=False)
+        os.utime(tmp_path / "prices_by_ticker" / f"ticker={t}" / "b-0.parquet", (0, 0))
+    return tmp_path
+
+def test_read_partition_dedups_newest_wins(src):
+    assert list_tickers(src / "prices_by_ticker") == ["AAA", "BBB", "CCC"]
+    px = read_partition(src / "prices_by_ticker", "AAA")
+    assert len(px) == 80 and px["date"].is_monotonic_increasing
+    assert (px["adj_close"] > 0).all() and (px["ticker"] == "AAA").all()
+
+def test_write_partition_replaces_files(tmp_path):
+    df = pd.DataFrame({"ticker": "X", "date": pd.bdate_range("2024-01-01", periods=3), "v": [1.0, 2.0, 3.0]})
+    write_partition(df, tmp_path, "X")
+    write_partition(df.head(2), tmp_path, "X")
+    assert [p.name for p in (tmp_path / "ticker=X").iterdir()] == ["part-0.parquet"]
+    assert len(read_partition(tmp_path, "X")) == 2
+
+def test_streamed_features_equal_monolithic_build(src, tmp_path):
+    build_by_ticker(src, tmp_path / "fv1")
+    ret = pd.concat([read_partition(src / "returns_by_ticker", t) for t in ["AAA","BBB","CCC"]])
+    px = pd.concat([read_partition(src / "prices_by_ticker", t, ["date","adj_close","volume"]) for t in ["AAA","BBB","CCC"]])
+    full = select_keep(build_features(ret.merge(px, on=["ticker","date"], how="left")))
+    for t, g in full.groupby("ticker", observed=True):
+        got = read_partition(tmp_path / "fv1", t)
+        pd.testing.assert_frame_equal(got.drop(columns="ticker"),
+                                      g.drop(columns="ticker").reset_index(drop=True), check_exact=True)
+
+def test_streamed_multistep_labels(src, tmp_path):
+    make_multistep_by_ticker(src / "returns_by_ticker", tmp_path / "ms", horizons=(1, 5))
+    ret = pd.concat([read_partition(src / "returns_by_ticker", t) for t in ["AAA","BBB","CCC"]])
+    full = add_multistep(ret, (1, 5))
+    got = pd.concat([read_partition(tmp_path / "ms", t) for t in list_tickers(tmp_path / "ms")], ignore_index=True)
+    pd.testing.assert_frame_equal(got, full)
+
+def test_batch_size_does_not_change_partitions(src, tmp_path):
+    tickers = build_by_ticker(src, tmp_path / "a", batch=1)
+    build_by_ticker(src, tmp_path / "b", batch=2)
+    for t in tickers:
+        assert (tmp_path / "a" / f"ticker={t}" / "part-0.parquet").read_bytes() == \
+               (tmp_path / "b" / f"ticker={t}" / "part-0.parquet").read_bytes()
+
+def test_parallel_build_writes_identical_partitions(src, tmp_path):
+    tickers = build_by_ticker(src, tmp_path / "serial", batch=1)
+    build_by_ticker(src, tmp_path / "par", batch=1, jobs=2)
+    for t in tickers:
+        assert (tmp_path / "serial" / f"ticker={t}" / "part-0.parquet").read_bytes() == \
+               (tmp_path / "par" / f"ticker={t}" / "part-0.parquet").read_bytes()
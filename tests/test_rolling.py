@@ -0,0 +1,27 @@
+# tests/test_rolling.py
+import numpy as np, pandas as pd
+
+from src.projectname.rolling import compensated_cumsum, rolling_stats, segments
+
+def test_rolling_stats_match_groupby_rolling():
+    rng = np.random.default_rng(3)
+    df = pd.DataFrame({"ticker": np.repeat(["A","B","C"], [50, 4, 80]),
+                       "x": rng.normal(0.001, 0.02, 134)})
+    df.loc[[0, 7, 60], "x"] = np.nan  # NaNs are skipped like pandas does
+    seg_start, _ = segments(df["ticker"].to_numpy())
+    for minp in [None, 3]:
+        got = rolling_stats(df["x"].to_numpy(), seg_start, [5, 20], min_periods=minp)
+        g = df.groupby("ticker")["x"]
+        for W in [5, 20]:
+            roll = g.rolling(W, min_periods=minp or W)
+            rm = roll.mean().reset_index(level=0, drop=True)
+            rs = roll.std().reset_index(level=0, drop=True)
+            np.testing.assert_allclose(got[f"roll_mean_{W}"], rm, rtol=1e-6, atol=1e-10, equal_nan=True)
+            np.testing.assert_allclose(got[f"roll_std_{W}"], rs, rtol=1e-6, atol=1e-10, equal_nan=True)
+            assert got[f"zscore_{W}"].dtype == np.float32
+
+def test_compensated_cumsum_beats_naive():
+    x = np.array([1e16, 1.0, -1e16, 1.0] * 1000)
+    hi, lo = compensated_cumsum(x)
+    assert (hi[-1] + lo[-1]) == 2000.0
+    assert np.cumsum(x)[-1] != 2000.0
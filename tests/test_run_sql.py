@@ -0,0 +1,40 @@
+# tests/test_run_sql.py
+import json, sqlite3
+import pytest
+
+from scripts.run_sql import explain, install_slow_log, main, statements
+
+def _db():
+    con = sqlite3.connect(":memory:")
+    con.executescript("""
+        CREATE TABLE prices (ticker TEXT, date TEXT, log_return REAL, PRIMARY KEY (ticker,date));
+        CREATE INDEX idx_prices_date ON prices(date);
+    """)
+    con.executemany("INSERT INTO prices VALUES(?,?,?)",
+                    [("A", f"2024-01-{d:02d}", d / 100) for d in range(1, 29)])
+    return con
+
+def test_statements_skip_comment_only_chunks():
+    assert statements("-- header\nSELECT 1;\n-- trailing note\n") == ["-- header\nSELECT 1"]
+
+def test_explain_flags_full_scan():
+    con = _db()
+    scan = explain(con, "SELECT * FROM prices WHERE log_return > 0.1")
+    seek = explain(con, "SELECT * FROM prices WHERE date BETWEEN ? AND ?", ["2024-01-02", "2024-01-05"])
+    assert scan["full_scan"].any()
+    assert not seek["full_scan"].any()
+
+def test_slow_log_writes_jsonl(tmp_path):
+    con = _db()
+    log = tmp_path / "slow.jsonl"
+    flush = install_slow_log(con, log, threshold_ms=0, every=1)
+    con.execute("SELECT COUNT(*) FROM prices").fetchall()
+    flush()
+    rec = [json.loads(x) for x in log.read_text().splitlines()]
+    assert rec and "COUNT(*)" in rec[-1]["sql"] and rec[-1]["ms"] >= 0
+
+def test_explain_is_rejected_for_parquet_backend(monkeypatch):
+    monkeypatch.setattr("sys.argv", ["run_sql.py", "--backend", "parquet", "--explain"])
+    with pytest.raises(SystemExit) as e:
+        main()
+    assert e.value.code == 2
@@ -0,0 +1,46 @@
+# tests/test_splitindex.py
+import numpy as np, pandas as pd
+
+from src.projectname.splitindex import SplitIndex, expanding_blocks, make_splits, map_splits
+
+def test_bounds_match_date_masks():
+    rng = np.random.default_rng(3)
+    parts = [pd.DataFrame({"ticker": t, "date": pd.bdate_range(s, periods=n), "x": rng.normal(size=n)})
+             for t, s, n in [("BBB", "2024-01-01", 40), ("AAA", "2024-01-15", 30), ("CCC", "2024-03-01", 5)]]
+    df = pd.concat(parts, ignore_index=True).sample(frac=1, random_state=0)
+    ix = SplitIndex(df)
+    assert list(ix.tickers) == ["AAA", "BBB", "CCC"]
+    for a, b in [("2024-01-01", "2024-01-31"), ("2024-01-20", "2024-02-05"), ("2024-02-24", "2024-03-04"),
+                 ("2025-01-01", "2025-02-01")]:
+        lo, hi = ix.bounds(pd.Timestamp(a), pd.Timestamp(b))
+        ref = ix.df[(ix.df["date"] >= a) & (ix.df["date"] <= b)]
+        assert (ix.take(lo, hi) == ref.index.to_numpy()).all()
+        for k in np.flatnonzero(hi > lo):
+            assert (ix.df["ticker"].iloc[lo[k]:hi[k]] == ix.tickers[k]).all()
+            assert np.shares_memory(ix.col("x")[lo[k]:hi[k]], ix.col("x"))  # a view, not a copy
+
+def _block_sums(ix, a, b):
+    lo, hi = ix.bounds(a, b)
+    x = ix.col("x2")
+    return [(ix.tickers[k], float(x[lo[k]:hi[k]].sum()), isinstance(x, np.memmap)) for k in np.flatnonzero(hi > lo)]
+
+def test_map_splits_workers_memory_map_the_index():
+    df = pd.DataFrame({"ticker": np.repeat(["A", "B"], 50), "date": np.tile(pd.bdate_range("2024-01-01", periods=50), 2)})
+    ix = SplitIndex(df)
+    items = [(pd.Timestamp("2024-01-01") + pd.Timedelta(days=7 * i), pd.Timestamp("2024-03-01")) for i in range(4)]
+    arrays = {"x2": np.arange(len(ix), dtype=np.float64) ** 2}
+    serial = map_splits(_block_sums, items, ix, arrays, jobs=1)
+    par = map_splits(_block_sums, items, ix, arrays, jobs=2)
+    assert [[r[:2] for r in s] for s in par] == [[r[:2] for r in s] for s in serial]
+    assert all(r[2] for s in par for r in s) and not any(r[2] for s in serial for r in s)
+
+def test_expanding_blocks_add_up_to_each_train_window():
+    df = pd.DataFrame({"ticker": np.repeat(["A", "B"], [50, 30]),
+                       "date": np.r_[pd.bdate_range("2024-01-01", periods=50), pd.bdate_range("2024-01-15", periods=30)]})
+    ix = SplitIndex(df)
+    splits = make_splits(ix.dates, 20, 5, 7, 2)
+    seen = np.array([], dtype=np.int64)
+    for (a, b, _, _), new in zip(splits, expanding_blocks(ix, splits)):
+        assert not np.isin(new, seen).any()
+        seen = np.r_[seen, new]
+        assert (np.sort(seen) == ix.take(*ix.bounds(a, b))).all()
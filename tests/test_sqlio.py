@@ -0,0 +1,152 @@
+# tests/test_sqlio.py
+import gc, os, sqlite3, threading
+import numpy as np, pandas as pd
+import pytest
+
+from scripts.build_db import DDL
+from src.projectname import sqlio
+
+@pytest.fixture()
+def db(tmp_path):
+    p = tmp_path / "prices.db"
+    rng = np.random.default_rng(0)
+    tks = ["AAA","BBB","CCC","DDD"]
+    dates = pd.bdate_range("2024-01-01", periods=60).strftime("%Y-%m-%d")
+    con = sqlite3.connect(p)
+    con.executescript(DDL)
+    con.executemany("INSERT INTO meta VALUES(?,?,?)",
+                    [(t, t, s) for t, s in zip(tks, ["Tech","Tech","Energy","Health"])])
+    rows = [(t, d, 100.0, 1000, float(rng.normal(0, 0.02))) for t in tks for d in dates]
+    con.executemany("INSERT INTO prices VALUES(?,?,?,?,?)", rows)
+    sqlio.refresh_sector_daily(con, dates[0], dates[-1])
+    con.commit(); con.close()
+    yield p
+    sqlio.close_pool()
+
+def test_query_df_reuses_thread_connection(db):
+    a = sqlio.read_connection(db)
+    df = sqlio.query_df("SELECT COUNT(*) AS n FROM prices", db_path=db)
+    assert int(df["n"].iloc[0]) == 240
+    assert sqlio.read_connection(db) is a
+    other = []
+    t = threading.Thread(target=lambda: other.append(sqlio.read_connection(db)))
+    t.start(); t.join()
+    assert other[0] is not a
+
+def test_thread_connections_close_when_thread_exits(db):
+    opened = []
+    ts = [threading.Thread(target=lambda: opened.append(sqlio.read_connection(db))) for _ in range(6)]
+    for t in ts: t.start()
+    for t in ts: t.join()
+    gc.collect()
+    for con in opened:
+        with pytest.raises(sqlite3.ProgrammingError):  # closed
+            con.execute("SELECT 1")
+    assert len(sqlio._live) <= 1  # only this thread's connections remain
+    assert sqlio.read_connection(db).execute("SELECT COUNT(*) FROM meta").fetchone()[0] == 4
+
+def test_pooled_connection_is_read_only(db):
+    with pytest.raises(sqlite3.OperationalError):
+        sqlio.read_connection(db).execute("DELETE FROM prices")
+
+def test_close_pool_reopens(db):
+    a = sqlio.read_connection(db)
+    sqlio.close_pool()
+    b = sqlio.read_connection(db)
+    assert b is not a
+    assert len(sqlio.query_df("SELECT * FROM meta", db_path=db)) == 4
+
+def test_sector_summary_matches_pandas(db):
+    con = sqlite3.connect(db)
+    raw = pd.read_sql_query("""SELECT m.sector, p.log_return FROM prices p JOIN meta m USING(ticker)
+                               WHERE p.date BETWEEN '2024-01-10' AND '2024-02-20'""", con)
+    con.close()
+    ref = (raw.assign(abs=raw["log_return"].abs()).groupby("sector")
+              .agg(mean_abs_return=("abs","mean"), mean_return=("log_return","mean"),
+                   std_return=("log_return","std")).reset_index())
+    got = sqlio.sector_summary("2024-01-10", "2024-02-20", db_path=db)
+    pd.testing.assert_frame_equal(got, ref, check_exact=False, rtol=1e-9)
+
+def test_sector_summary_empty_range(db):
+    got = sqlio.sector_summary("1990-01-01", "1990-12-31", db_path=db)
+    assert got.empty and "std_return" in got.columns
+
+def test_sector_daily_matches_prices_scan(db):
+    daily = sqlio.sector_summary("2024-01-10", "2024-02-20", db_path=db)
+    con = sqlite3.connect(db)
+    con.execute("DROP TABLE sector_daily"); con.commit(); con.close()
+    sqlio.close_pool()
+    scan = sqlio.sector_summary("2024-01-10", "2024-02-20", db_path=db)
+    pd.testing.assert_frame_equal(daily, scan, check_exact=False, rtol=1e-12)
+
+def test_refresh_sector_daily_only_touches_range(db):
+    con = sqlite3.connect(db)
+    con.execute("UPDATE prices SET log_return = 0.5 WHERE ticker='AAA' AND date='2024-01-02'")
+    con.execute("UPDATE prices SET log_return = 0.5 WHERE ticker='AAA' AND date='2024-01-03'")
+    sqlio.refresh_sector_daily(con, "2024-01-03", "2024-01-03")
+    con.commit()
+    q = "SELECT max_abs FROM sector_daily WHERE sector='Tech' AND date=?"
+    assert con.execute(q, ("2024-01-03",)).fetchone()[0] == 0.5
+    assert con.execute(q, ("2024-01-02",)).fetchone()[0] < 0.5
+    con.close()
+
+def test_old_db_gets_full_sector_daily_on_first_upsert(db):
+    from scripts.get_prices import upsert_db
+    con = sqlite3.connect(db)
+    con.execute("DROP TABLE sector_daily"); con.commit(); con.close()  # built before sector_daily
+    new = pd.DataFrame({"ticker": ["AAA", "BBB"], "date": ["2024-03-26", "2024-03-26"], "adj_close": 100.0,
+                        "volume": 1000, "log_return": [0.01, -0.02]})
+    upsert_db(db, new)
+    got = sqlio.sector_summary("2024-01-01", "2024-03-31", db_path=db)
+    con = sqlite3.connect(db)
+    con.execute("DROP TABLE sector_daily"); con.commit(); con.close()
+    sqlio.close_pool()
+    scan = sqlio.sector_summary("2024-01-01", "2024-03-31", db_path=db)
+    pd.testing.assert_frame_equal(got, scan, check_exact=False, rtol=1e-12)
+    assert got["std_return"].notna().all()
+
+def test_parquet_backend_runs_sql_files(tmp_path):
+    pytest.importorskip("duckdb")
+    from pathlib import Path
+    rng = np.random.default_rng(1)
+    dates = pd.bdate_range("2024-01-01", periods=40)
+    for t, sec in [("AAA","Tech"), ("BBB","Energy")]:
+        r = pd.DataFrame({"date": dates, "log_return": rng.normal(0, 0.02, len(dates)).astype("float32")})
+        p = pd.DataFrame({"date": dates, "adj_close": 100.0, "volume": 1, "name": t, "sector": sec})
+        for name, df in [("returns_by_ticker", r), ("prices_by_ticker", p)]:
+            d = tmp_path / name / f"ticker={t}"; d.mkdir(parents=True)
+            df.to_parquet(d / "part-0.parquet", index=False)
+    # a newer leftover part file for AAA: its rows win, as in partitions.read_partition
+    newer = tmp_path / "prices_by_ticker" / "ticker=AAA" / "part-1.parquet"
+    pd.DataFrame({"date": dates[:5], "adj_close": 200.0, "volume": 2, "name": "AAA", "sector": "Health"}).to_parquet(newer, index=False)
+    os.utime(newer, (2e9, 2e9))
+    try:
+        full = sqlio.query_df("SELECT * FROM prices ORDER BY ticker, date", backend="parquet", parquet_root=tmp_path)
+        meta = sqlio.query_df("SELECT * FROM meta ORDER BY ticker", backend="parquet", parquet_root=tmp_path)
+        top = sqlio.query_df(Path("sql/sector_top_moves.sql").read_text(),
+                             backend="parquet", parquet_root=tmp_path)
+        win = sqlio.query_df(Path("sql/features_window.sql").read_text(), ["2024-01-10", "2024-02-01"],
+                             backend="parquet", parquet_root=tmp_path)
+    finally:
+        sqlio.close_pool()
+    assert list(full.columns) == ["ticker", "date", "adj_close", "volume", "log_return"] and len(full) == 80
+    assert full["adj_close"].tolist()[:6] == [200.0] * 5 + [100.0] and full["volume"].iloc[:5].eq(2).all()
+    assert meta.values.tolist() == [["AAA", "AAA", "Health"], ["BBB", "BBB", "Energy"]]
+    assert len(top) == 10 and top["abs_move"].is_monotonic_decreasing
+    assert set(top["sector"]) <= {"Tech", "Energy", "Health"}
+    assert win["date"].min() >= pd.Timestamp("2024-01-10") and win["ticker"].nunique() == 2
+    g = win[win["ticker"] == "AAA"]
+    assert np.allclose(g["lag1"].iloc[1:], g["r_1d"].iloc[:-1])
+
+def test_top_moves_uses_abs_index(db):
+    con = sqlite3.connect(db)
+    plan = con.execute("EXPLAIN QUERY PLAN " + open("sql/sector_top_moves.sql").read()).fetchall()
+    raw = pd.read_sql_query("SELECT m.sector, p.ticker, p.date, p.log_return FROM prices p "
+                            "JOIN meta m USING(ticker)", con)
+    con.close()
+    assert any("idx_prices_abs_return" in str(r) for r in plan)
+    raw = raw.assign(abs_move=raw["log_return"].abs())
+    got = sqlio.top_moves(5, start="2024-01-15", sector="Tech", db_path=db)
+    ref = raw[(raw["date"] >= "2024-01-15") & (raw["sector"] == "Tech")].nlargest(5, "abs_move")
+    assert got["abs_move"].tolist() == ref["abs_move"].tolist()
+    assert len(sqlio.top_moves(db_path=db)) == 10